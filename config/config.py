@@ -1,41 +1,73 @@
 import os
-from dataclasses import dataclass
-from typing import Optional
+import functools
+from typing import ClassVar, Optional, Tuple
 from dotenv import load_dotenv
 
-load_dotenv()
-
-@dataclass
-class Config:
+# attribute name -> (environment variable, default, type)
+_ENV_MAP = {
     # Google AI Studio
-    google_api_key: str = os.getenv("GOOGLE_API_KEY", "")
+    'google_api_key': ("GOOGLE_API_KEY", "", str),
 
     # Databricks
-    databricks_host: str = os.getenv("DATABRICKS_HOST", "")
-    databricks_token: str = os.getenv("DATABRICKS_TOKEN", "")
+    'databricks_host': ("DATABRICKS_HOST", "", str),
+    'databricks_token': ("DATABRICKS_TOKEN", "", str),
 
     # AWS S3
-    aws_access_key_id: str = os.getenv("AWS_ACCESS_KEY_ID", "")
-    aws_secret_access_key: str = os.getenv("AWS_SECRET_ACCESS_KEY", "")
-    aws_region: str = os.getenv("AWS_REGION", "us-west-2")
+    'aws_access_key_id': ("AWS_ACCESS_KEY_ID", "", str),
+    'aws_secret_access_key': ("AWS_SECRET_ACCESS_KEY", "", str),
+    'aws_region': ("AWS_REGION", "us-west-2", str),
 
     # S3 Bucket Configuration
-    databricks_logs_bucket: str = os.getenv("DATABRICKS_LOGS_BUCKET", "")
-    databricks_logs_prefix: str = os.getenv("DATABRICKS_LOGS_PREFIX", "databrickslogs")
+    'databricks_logs_bucket': ("DATABRICKS_LOGS_BUCKET", "", str),
+    'databricks_logs_prefix': ("DATABRICKS_LOGS_PREFIX", "databrickslogs", str),
 
     # LLM Configuration
-    max_token_limit: int = int(os.getenv("MAX_TOKEN_LIMIT", "100000"))
-    log_search_chunk_size: int = int(os.getenv("LOG_SEARCH_CHUNK_SIZE", "10000"))
+    'max_token_limit': ("MAX_TOKEN_LIMIT", "100000", int),
+    'log_search_chunk_size': ("LOG_SEARCH_CHUNK_SIZE", "10000", int),
+}
+
+class Config:
+    """
+    Settings read lazily from the environment.
+
+    Each field is resolved with os.getenv on first access and cached in its
+    slot, so a late load_dotenv() still takes effect for unread fields.
+    """
+
+    __slots__ = tuple(_ENV_MAP)
+
+    # Fields that must be non-empty for the agent to run
+    _REQUIRED: ClassVar[Tuple[str, ...]] = (
+        'google_api_key',
+        'databricks_host',
+        'databricks_token',
+        'aws_access_key_id',
+        'aws_secret_access_key',
+        'databricks_logs_bucket'
+    )
+
+    def __getattr__(self, name: str):
+        # Only called when the slot has not been filled yet
+        try:
+            env_var, default, cast = _ENV_MAP[name]
+        except KeyError:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        value = cast(os.getenv(env_var, default))
+        setattr(self, name, value)
+        return value
 
     def validate(self) -> bool:
-        required_fields = [
-            self.google_api_key,
-            self.databricks_host,
-            self.databricks_token,
-            self.aws_access_key_id,
-            self.aws_secret_access_key,
-            self.databricks_logs_bucket
-        ]
-        return all(field for field in required_fields)
-
-config = Config()
\ No newline at end of file
+        return all(getattr(self, name) for name in self._REQUIRED)
+
+@functools.lru_cache(maxsize=1)
+def get_config() -> Config:
+    """Load .env and return the process-wide Config, built on first call."""
+    load_dotenv()
+    return Config()
+
+def __getattr__(name: str):
+    # Keep `from config.config import config` working without building it at import
+    if name == 'config':
+        return get_config()
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -21,7 +21,7 @@ from src.tools.databricks_tools import (
     search_failed_job_runs,
     analyze_cluster_logs
 )
-from config.config import config
+from config.config import get_config
 
 async def example_1_find_failed_jobs():
     """Example 1: Find all failed jobs in the last 24 hours"""
@@ -50,8 +50,9 @@ async def example_2_analyze_specific_job():
         print(jobs_result)
 
         # Get cluster IDs for recent runs
-        start_time = (datetime.now() - timedelta(hours=24)).strftime('%Y-%m-%d %H:%M:%S')
-        end_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        now = datetime.now()
+        start_time = (now - timedelta(hours=24)).strftime('%Y-%m-%d %H:%M:%S')
+        end_time = now.strftime('%Y-%m-%d %H:%M:%S')
 
         cluster_ids_result = await get_job_cluster_ids(job_pattern, start_time, end_time)
         print("\nCluster IDs:")
@@ -168,7 +169,7 @@ async def main():
     print("=" * 60)
 
     # Check if configuration is valid
-    if not config.validate():
+    if not get_config().validate():
         print_configuration_guide()
         print("❌ Configuration is incomplete. Please set up your environment first.")
         return
@@ -16,7 +16,6 @@ Usage:
 
 import os
 import sys
-import argparse
 import asyncio
 from pathlib import Path
 
@@ -24,12 +23,12 @@ from pathlib import Path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-from config.config import config
-from src.agents.databricks_log_agent import create_databricks_log_agent
+from config.config import get_config
 
 def check_configuration():
     """Check if all required configuration is present."""
     print("Checking configuration...")
+    config = get_config()
 
     required_configs = [
         ("GOOGLE_API_KEY", config.google_api_key),
@@ -64,6 +63,8 @@ def run_interactive_mode():
     print("\n🤖 Starting Databricks Log Analysis Agent...")
     print("=" * 50)
 
+    # Imported here so --help and --config-check skip loading ADK, boto3 and the SDK
+    from src.agents.databricks_log_agent import create_databricks_log_agent
     agent = create_databricks_log_agent()
 
     print("\nAgent ready! You can ask questions about Databricks job logs.")
@@ -116,6 +117,13 @@ def run_api_server():
     print("Run: adk api_server")
 
 def main():
+    # No flags is the common case; skip building the parser entirely
+    if len(sys.argv) == 1:
+        run_interactive_mode()
+        return
+
+    import argparse
+
     parser = argparse.ArgumentParser(
         description="Databricks Log Analysis Agent",
         formatter_class=argparse.RawDescriptionHelpFormatter,
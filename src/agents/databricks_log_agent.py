@@ -1,9 +1,7 @@
-import os
 import sys
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from google.adk import Agent
-from config.config import config
+from config.config import get_config
 from src.tools.databricks_tools import (
     search_databricks_jobs,
     get_job_cluster_ids,
@@ -99,7 +97,7 @@ def create_databricks_log_agent():
     return agent
 
 if __name__ == "__main__":
-    if not config.validate():
+    if not get_config().validate():
         print("Error: Missing required configuration. Please check your .env file.")
         print("Required variables: GOOGLE_API_KEY, DATABRICKS_HOST, DATABRICKS_TOKEN, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, DATABRICKS_LOGS_BUCKET")
         sys.exit(1)
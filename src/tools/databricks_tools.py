@@ -1,12 +1,106 @@
-from google.adk import Agent
-from typing import List, Dict, Optional
+from typing import TYPE_CHECKING, Any, List, Dict, Optional, Union
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 import asyncio
-import json
-
-from src.utils.databricks_client import DatabricksClient
-from src.utils.s3_client import S3LogClient
-from src.utils.log_analyzer import LogAnalyzer
+import functools
+import heapq
+import itertools
+import logging
+import operator
+import re
+import orjson
+
+# The clients pull in the Databricks SDK and boto3, so they are imported on
+# first use rather than when the agent registers its tools
+if TYPE_CHECKING:
+    from src.utils.databricks_client import DatabricksClient
+    from src.utils.s3_client import S3LogClient
+
+logger = logging.getLogger(__name__)
+
+# Error-prone log types first; anything else sorts after these
+_LOG_TYPE_PRIORITY = {'stderr': 0, 'log4j': 1, 'driver': 2, 'executor': 3}
+
+# Most decoded logs one tool call holds in memory at once. Each download keeps
+# its whole log until it is analyzed or searched, so this also caps the tool's
+# downloads in flight (S3LogClient.MAX_CONCURRENT_DOWNLOADS is the client's own
+# read-ahead limit for pattern searches)
+_MAX_RESIDENT_LOGS = 5
+
+# Fields of a failed run worth returning to the agent; run names and creators
+# only cost output tokens
+_FAILED_RUN_FIELDS = ('run_id', 'job_id', 'job_name', 'cluster_id', 'task_cluster_ids',
+                      'state', 'start_time', 'end_time', 'execution_duration')
+
+# Sort key stand-in for runs that have not started yet
+_DT_MIN = datetime.min
+
+# Patterns for quick_error_scan, compiled once at import
+_CRITICAL_PATTERNS = {
+    'critical_errors': [
+        re.compile(pattern, re.IGNORECASE | re.MULTILINE) for pattern in (
+            r'(?i)\bfatal\s+error\b',
+            r'(?i)\boutofmemoryerror\b',
+            r'(?i)\bjob\s+\d+\s+failed\b',
+            r'(?i)\banalysisexception\b'
+        )
+    ]
+}
+
+def _label_critical_error(line: str) -> str:
+    # Lowercased once; substring checks beat a regex pass on these short keywords
+    line = line.lower()
+    if 'outofmemory' in line:
+        return 'Memory Issues'
+    if 'job' in line and 'failed' in line:
+        return 'Job Failures'
+    if 'analysisexception' in line:
+        return 'SQL Errors'
+    return 'Critical Errors'
+
+# Results are read by the model, not people, so they are emitted compact
+_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_DATACLASS
+
+@dataclass
+class TimelineEntry:
+    """One run in get_job_execution_timeline; orjson encodes it natively."""
+    __slots__ = ('job_name', 'run_id', 'cluster_id', 'state',
+                 'start_time', 'end_time', 'duration_seconds')
+
+    job_name: str
+    run_id: int
+    cluster_id: Optional[str]
+    state: Dict[str, Any]
+    start_time: Optional[datetime]
+    end_time: Optional[datetime]
+    duration_seconds: Optional[int]
+
+def _dumps(obj) -> str:
+    """Serialize a tool result as compact JSON; anything orjson can't encode falls back to str()."""
+    return orjson.dumps(obj, default=str, option=_JSON_OPTIONS).decode()
+
+def _parse_timestamp(value: Union[str, datetime]) -> datetime:
+    """Parse a 'YYYY-MM-DD HH:MM:SS' tool argument; datetimes pass through."""
+    if isinstance(value, datetime):
+        return value
+    # fromisoformat is implemented in C and accepts a space separator
+    return datetime.fromisoformat(value)
+
+# One client of each kind per process. Concurrent tool calls on the agent's event
+# loop all share them: the factories never await, so two calls can't race to
+# build a second instance, and neither client holds per-loop state to scope.
+@functools.lru_cache(maxsize=1)
+def _get_databricks_client() -> 'DatabricksClient':
+    """Shared Databricks client, so HTTP sessions are reused across tool calls."""
+    from src.utils.databricks_client import DatabricksClient
+    return DatabricksClient()
+
+@functools.lru_cache(maxsize=1)
+def _get_s3_client() -> 'S3LogClient':
+    """Shared S3 client, so the boto3 session and connection pool are reused."""
+    from src.utils.s3_client import S3LogClient
+    return S3LogClient()
 
 async def search_databricks_jobs(job_name_pattern: str) -> str:
     """
@@ -19,7 +113,7 @@ async def search_databricks_jobs(job_name_pattern: str) -> str:
         JSON string with matching jobs information
     """
     try:
-        client = DatabricksClient()
+        client = _get_databricks_client()
         jobs = await client.search_jobs_by_name(job_name_pattern)
 
         if not jobs:
@@ -30,7 +124,7 @@ async def search_databricks_jobs(job_name_pattern: str) -> str:
             "jobs": jobs
         }
 
-        return json.dumps(result, indent=2, default=str)
+        return _dumps(result)
 
     except Exception as e:
         return f"Error searching jobs: {str(e)}"
@@ -50,16 +144,12 @@ async def get_job_cluster_ids(job_name_pattern: str,
         JSON string with cluster IDs and job run information
     """
     try:
-        client = DatabricksClient()
+        client = _get_databricks_client()
 
         time_range = None
-        if start_time and end_time:
-            start_dt = datetime.strptime(start_time, '%Y-%m-%d %H:%M:%S')
-            end_dt = datetime.strptime(end_time, '%Y-%m-%d %H:%M:%S')
-            time_range = (start_dt, end_dt)
-        elif start_time:
-            start_dt = datetime.strptime(start_time, '%Y-%m-%d %H:%M:%S')
-            end_dt = datetime.now()
+        if start_time:
+            start_dt = _parse_timestamp(start_time)
+            end_dt = _parse_timestamp(end_time) if end_time else datetime.now()
             time_range = (start_dt, end_dt)
 
         cluster_ids = await client.get_cluster_ids_for_job(job_name_pattern, time_range)
@@ -74,7 +164,7 @@ async def get_job_cluster_ids(job_name_pattern: str,
             "total_clusters": len(cluster_ids)
         }
 
-        return json.dumps(result, indent=2)
+        return _dumps(result)
 
     except Exception as e:
         return f"Error getting cluster IDs: {str(e)}"
@@ -92,7 +182,7 @@ async def search_failed_job_runs(job_name_pattern: Optional[str] = None,
         JSON string with failed job runs information
     """
     try:
-        client = DatabricksClient()
+        client = _get_databricks_client()
         failed_runs = await client.search_failed_runs(job_name_pattern, hours_back)
 
         if not failed_runs:
@@ -101,10 +191,11 @@ async def search_failed_job_runs(job_name_pattern: Optional[str] = None,
         result = {
             "search_period_hours": hours_back,
             "failed_runs_count": len(failed_runs),
-            "failed_runs": failed_runs
+            "failed_runs": [{field: run.get(field) for field in _FAILED_RUN_FIELDS}
+                            for run in failed_runs]
         }
 
-        return json.dumps(result, indent=2, default=str)
+        return _dumps(result)
 
     except Exception as e:
         return f"Error searching failed runs: {str(e)}"
@@ -120,7 +211,7 @@ async def list_cluster_logs(cluster_id: str) -> str:
         JSON string with available log files information
     """
     try:
-        s3_client = S3LogClient()
+        s3_client = _get_s3_client()
         log_files = await s3_client.list_cluster_logs(cluster_id)
 
         if not log_files:
@@ -129,10 +220,10 @@ async def list_cluster_logs(cluster_id: str) -> str:
         result = {
             "cluster_id": cluster_id,
             "log_files_count": len(log_files),
-            "log_files": log_files
+            "log_files": [log_file._asdict() for log_file in log_files]
         }
 
-        return json.dumps(result, indent=2, default=str)
+        return _dumps(result)
 
     except Exception as e:
         return f"Error listing cluster logs: {str(e)}"
@@ -152,7 +243,8 @@ async def analyze_cluster_logs(cluster_id: str,
         Detailed analysis of the cluster logs
     """
     try:
-        s3_client = S3LogClient()
+        s3_client = _get_s3_client()
+        from src.utils.log_analyzer import LogAnalyzer
         analyzer = LogAnalyzer()
 
         # Get list of log files
@@ -161,41 +253,65 @@ async def analyze_cluster_logs(cluster_id: str,
         if not log_files:
             return f"No log files found for cluster: {cluster_id}"
 
-        # Prioritize error-prone log types
-        priority_types = ['stderr', 'log4j', 'driver', 'executor']
-        sorted_files = sorted(log_files,
-                            key=lambda x: (priority_types.index(x['log_type'])
-                                         if x['log_type'] in priority_types else 99,
-                                         -x['size']))
+        # Prioritize error-prone log types; only the top max_files need ordering
+        selected_files = heapq.nsmallest(max_files, log_files,
+                                         key=lambda x: (_LOG_TYPE_PRIORITY.get(x.log_type, 99),
+                                                        -x.size))
 
-        # Download and analyze logs
-        log_content = {}
         files_processed = 0
 
-        for log_file in sorted_files[:max_files]:
+        async def _stream_logs():
+            # Files are yielded in selected_files order, so the analysis does not
+            # depend on which download finishes first. A file holds its slot in
+            # the read-ahead window until the analyzer has consumed it, so at
+            # most _MAX_RESIDENT_LOGS logs are resident
+            nonlocal files_processed
+            remaining = iter(selected_files)
+            pending = deque()
+
+            def fill():
+                for log_file in itertools.islice(remaining, _MAX_RESIDENT_LOGS - len(pending)):
+                    pending.append((log_file, asyncio.ensure_future(
+                        s3_client.download_and_read_log(log_file.key, max_size_mb=20)
+                    )))
+
+            fill()
             try:
-                content = await s3_client.download_and_read_log(log_file['key'], max_size_mb=20)
-                log_content[log_file['file_name']] = content
-                files_processed += 1
-            except Exception as e:
-                print(f"Warning: Could not process {log_file['file_name']}: {str(e)}")
-                continue
-
-        if not log_content:
+                while pending:
+                    log_file, task = pending[0]
+                    try:
+                        content = await task
+                    except Exception as e:
+                        pending.popleft()
+                        logger.warning("Could not process %s: %s", log_file.file_name, e)
+                        fill()
+                        continue
+
+                    files_processed += 1
+                    yield log_file.file_name, content
+                    # Release the consumed file before its slot is reused
+                    del content
+                    pending.popleft()
+                    fill()
+            finally:
+                for _, task in pending:
+                    task.cancel()
+
+        # Analyze the logs as they arrive
+        analysis = await analyzer.analyze_logs_streaming(_stream_logs(), search_pattern)
+
+        if not files_processed:
             return f"Could not read any log files for cluster: {cluster_id}"
 
-        # Analyze the logs
-        analysis = await analyzer.analyze_logs(log_content, search_pattern)
-
         result = {
             "cluster_id": cluster_id,
             "files_analyzed": files_processed,
             "search_pattern": search_pattern,
-            "analysis_method": "iterative" if use_iterative else "standard",
+            "analysis_method": "streaming",
             "analysis": analysis
         }
 
-        return json.dumps(result, indent=2, default=str)
+        return _dumps(result)
 
     except Exception as e:
         return f"Error analyzing cluster logs: {str(e)}"
@@ -215,7 +331,7 @@ async def search_log_pattern(cluster_id: str,
         Search results with matching log snippets
     """
     try:
-        s3_client = S3LogClient()
+        s3_client = _get_s3_client()
 
         # Get list of log files
         log_files = await s3_client.list_cluster_logs(cluster_id)
@@ -225,29 +341,39 @@ async def search_log_pattern(cluster_id: str,
 
         # Filter by log types if specified
         if log_types:
-            log_files = [f for f in log_files if f['log_type'] in log_types]
-
-        search_results = []
-
-        for log_file in log_files:
-            try:
-                snippet = await s3_client.get_log_snippet(
-                    log_file['key'],
-                    search_pattern,
+            wanted_types = frozenset(log_types)
+            log_files = [f for f in log_files if f.log_type in wanted_types]
+
+        # Compile once and share across every file searched
+        compiled_pattern = re.compile(search_pattern, re.IGNORECASE)
+        semaphore = asyncio.Semaphore(_MAX_RESIDENT_LOGS)
+
+        async def _snippet(log_file):
+            async with semaphore:
+                return await s3_client.get_log_snippet(
+                    log_file.key,
+                    compiled_pattern,
                     max_lines=50,
                     around_lines=3
                 )
 
-                if snippet and "Error reading log snippet" not in snippet:
-                    search_results.append({
-                        "file_name": log_file['file_name'],
-                        "log_type": log_file['log_type'],
-                        "matches": snippet
-                    })
+        snippets = await asyncio.gather(*[_snippet(f) for f in log_files],
+                                        return_exceptions=True)
 
-            except Exception as e:
+        search_results = []
+
+        for log_file, snippet in zip(log_files, snippets):
+            if isinstance(snippet, Exception):
+                logger.debug("Could not search %s: %s", log_file.file_name, snippet)
                 continue
 
+            if snippet and "Error reading log snippet" not in snippet:
+                search_results.append({
+                    "file_name": log_file.file_name,
+                    "log_type": log_file.log_type,
+                    "matches": snippet
+                })
+
         if not search_results:
             return f"Pattern '{search_pattern}' not found in any logs for cluster: {cluster_id}"
 
@@ -258,25 +384,27 @@ async def search_log_pattern(cluster_id: str,
             "results": search_results
         }
 
-        return json.dumps(result, indent=2)
+        return _dumps(result)
 
     except Exception as e:
         return f"Error searching log pattern: {str(e)}"
 
 async def get_job_execution_timeline(job_name_pattern: str,
-                                   hours_back: int = 24) -> str:
+                                   hours_back: int = 24,
+                                   max_runs: int = 100) -> str:
     """
     Get execution timeline for jobs matching the pattern.
 
     Args:
         job_name_pattern: Pattern to search for in job names
         hours_back: How many hours back to search (default: 24)
+        max_runs: Maximum number of most recent runs to include (default: 100)
 
     Returns:
         JSON string with job execution timeline
     """
     try:
-        client = DatabricksClient()
+        client = _get_databricks_client()
 
         # Find matching jobs
         jobs = await client.search_jobs_by_name(job_name_pattern)
@@ -285,36 +413,40 @@ async def get_job_execution_timeline(job_name_pattern: str,
             return f"No jobs found matching pattern: {job_name_pattern}"
 
         # Get runs for each job
-        start_time = datetime.now() - timedelta(hours=hours_back)
         end_time = datetime.now()
+        start_time = end_time - timedelta(hours=hours_back)
 
-        timeline = []
+        runs_per_job = await client.gather_bounded(
+            client.get_job_runs(job['job_id'], start_time, end_time, limit=20) for job in jobs
+        )
 
-        for job in jobs:
-            runs = await client.get_job_runs(job['job_id'], start_time, end_time, limit=20)
+        # Keep the sort key next to each entry so it is computed once
+        keyed_timeline = []
 
+        for job, runs in zip(jobs, runs_per_job):
             for run in runs:
-                timeline.append({
-                    "job_name": job['job_name'],
-                    "run_id": run['run_id'],
-                    "cluster_id": run['cluster_id'],
-                    "state": run['state'],
-                    "start_time": run['start_time'],
-                    "end_time": run['end_time'],
-                    "duration_seconds": run['execution_duration']
-                })
-
-        # Sort by start time
-        timeline.sort(key=lambda x: x['start_time'] or datetime.min, reverse=True)
+                keyed_timeline.append((run['start_time'] or _DT_MIN, TimelineEntry(
+                    job_name=job['job_name'],
+                    run_id=run['run_id'],
+                    cluster_id=run['cluster_id'],
+                    state=run['state'],
+                    start_time=run['start_time'],
+                    end_time=run['end_time'],
+                    duration_seconds=run['execution_duration']
+                )))
+
+        # Most recent runs first; only the top max_runs need ordering
+        latest = heapq.nlargest(max_runs, keyed_timeline, key=operator.itemgetter(0))
+        timeline = [entry for _, entry in latest]
 
         result = {
             "job_pattern": job_name_pattern,
             "time_period_hours": hours_back,
-            "total_runs": len(timeline),
+            "total_runs": len(keyed_timeline),
             "timeline": timeline
         }
 
-        return json.dumps(result, indent=2, default=str)
+        return _dumps(result)
 
     except Exception as e:
         return f"Error getting job timeline: {str(e)}"
@@ -332,7 +464,7 @@ async def analyze_cluster_logs_smart(cluster_id: str,
         Optimized analysis results focusing on critical errors
     """
     try:
-        s3_client = S3LogClient()
+        s3_client = _get_s3_client()
 
         # Use iterative pattern search for fast error discovery
         pattern_results = await s3_client.search_iterative_patterns(cluster_id, max_iterations=3)
@@ -409,7 +541,7 @@ async def analyze_cluster_logs_smart(cluster_id: str,
                 "📁 I/O troubleshooting: Verify file paths, permissions, and storage connectivity"
             )
 
-        return json.dumps(summary, indent=2, default=str)
+        return _dumps(summary)
 
     except Exception as e:
         return f"Error in smart log analysis: {str(e)}"
@@ -425,21 +557,12 @@ async def quick_error_scan(cluster_id: str) -> str:
         Quick summary of critical errors found
     """
     try:
-        s3_client = S3LogClient()
+        s3_client = _get_s3_client()
 
         # Single iteration focusing only on critical patterns
-        critical_patterns = {
-            'critical_errors': [
-                r'(?i)\bfatal\s+error\b',
-                r'(?i)\boutofmemoryerror\b',
-                r'(?i)\bjob\s+\d+\s+failed\b',
-                r'(?i)\banalysisexception\b'
-            ]
-        }
-
         errors = await s3_client.search_error_patterns(
             cluster_id,
-            custom_patterns=critical_patterns,
+            custom_patterns=_CRITICAL_PATTERNS,
             max_errors_per_category=10
         )
 
@@ -449,16 +572,8 @@ async def quick_error_scan(cluster_id: str) -> str:
         critical_count = len(errors['critical_errors'])
 
         # Extract key error details
-        error_types = set()
-        for error in errors['critical_errors'][:5]:
-            if 'outofmemory' in error['line'].lower():
-                error_types.add('Memory Issues')
-            elif 'job' in error['line'].lower() and 'failed' in error['line'].lower():
-                error_types.add('Job Failures')
-            elif 'analysisexception' in error['line'].lower():
-                error_types.add('SQL Errors')
-            else:
-                error_types.add('Critical Errors')
+        error_types = {_label_critical_error(error['line'])
+                       for error in errors['critical_errors'][:5]}
 
         result = {
             "cluster_id": cluster_id,
@@ -469,7 +584,7 @@ async def quick_error_scan(cluster_id: str) -> str:
             "recommendation": "Run full analysis for detailed diagnosis" if critical_count > 0 else "No immediate action needed"
         }
 
-        return json.dumps(result, indent=2, default=str)
+        return _dumps(result)
 
     except Exception as e:
         return f"Error in quick error scan: {str(e)}"
\ No newline at end of file
@@ -1,4 +1,6 @@
 import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 from databricks.sdk import WorkspaceClient
@@ -6,30 +8,103 @@ from databricks.sdk.service.jobs import Run, Job
 from config.config import config
 import re
 
+# The Databricks SDK is synchronous; its calls run here so they don't block the event loop
+_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix='databricks-sdk')
+
+async def _run_blocking(func):
+    return await asyncio.get_running_loop().run_in_executor(_EXECUTOR, func)
+
+def _state_to_dict(state, include_message: bool = True) -> Dict:
+    """Flatten an SDK run/task state into plain strings."""
+    if not state:
+        result = {'life_cycle_state': None, 'result_state': None}
+        if include_message:
+            result['state_message'] = None
+        return result
+
+    life_cycle_state = state.life_cycle_state
+    result_state = state.result_state
+    result = {
+        'life_cycle_state': life_cycle_state.value if life_cycle_state else None,
+        'result_state': result_state.value if result_state else None,
+    }
+    if include_message:
+        result['state_message'] = state.state_message
+    return result
+
+# Characters that give a job name pattern regex meaning; without any of them it
+# is a plain substring
+_REGEX_META = frozenset('.^$*+?{}[]\\|()')
+
+# Run states that count as a failure in search_failed_runs
+_FAILED_RESULT_STATES = frozenset({'FAILED', 'CANCELED', 'TIMEOUT'})
+_FAILED_LIFECYCLE_STATES = frozenset({'INTERNAL_ERROR'})
+
+def _from_epoch_ms(timestamp_ms: Optional[int]) -> Optional[datetime]:
+    # Runs are listed at most a few hundred at a time, so converting per field is
+    # cheap; callers sort and compare these against datetime windows directly
+    return datetime.fromtimestamp(timestamp_ms / 1000) if timestamp_ms else None
+
 class DatabricksClient:
+    # How long the workspace job listing is reused before hitting the API again
+    JOBS_LIST_TTL_SECONDS = 60
+
+    # Upper bound on Databricks API calls in flight when fanning out per job/run;
+    # the tools fan out through gather_bounded too, so this is the only limit
+    MAX_CONCURRENT_REQUESTS = 10
+
     def __init__(self):
         self.client = WorkspaceClient(
             host=config.databricks_host,
             token=config.databricks_token
         )
+        self._jobs_cache: Optional[Tuple[float, List[Dict]]] = None
+
+    async def gather_bounded(self, coros) -> List:
+        """Run coroutines concurrently, at most MAX_CONCURRENT_REQUESTS at a time."""
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+
+        async def _bounded(coro):
+            async with semaphore:
+                return await coro
+
+        return await asyncio.gather(*[_bounded(coro) for coro in coros])
+
+    async def _list_all_jobs(self) -> List[Dict]:
+        """
+        List every job in the workspace, reusing the listing for JOBS_LIST_TTL_SECONDS.
+
+        Tool calls within one conversation turn tend to list jobs repeatedly,
+        and each listing pages through the whole workspace. Only the fields the
+        searches need are kept; the SDK's full Job objects are dropped page by page.
+        """
+        if self._jobs_cache and time.monotonic() - self._jobs_cache[0] < self.JOBS_LIST_TTL_SECONDS:
+            return self._jobs_cache[1]
+
+        def _list():
+            return [{
+                'job_id': job.job_id,
+                'job_name': job.settings.name,
+                'created_time': job.created_time,
+                'creator_user_name': job.creator_user_name
+            } for job in self.client.jobs.list()]
+
+        jobs = await _run_blocking(_list)
+        self._jobs_cache = (time.monotonic(), jobs)
+        return jobs
 
     async def search_jobs_by_name(self, job_name_pattern: str) -> List[Dict]:
         try:
-            jobs = list(self.client.jobs.list())
-            matching_jobs = []
+            jobs = await self._list_all_jobs()
 
-            pattern = re.compile(job_name_pattern, re.IGNORECASE)
+            # Plain names are the usual input; a substring check skips the regex engine
+            if job_name_pattern.isascii() and _REGEX_META.isdisjoint(job_name_pattern):
+                needle = job_name_pattern.lower()
+                return [job for job in jobs if needle in job['job_name'].lower()]
 
-            for job in jobs:
-                if pattern.search(job.settings.name):
-                    matching_jobs.append({
-                        'job_id': job.job_id,
-                        'job_name': job.settings.name,
-                        'created_time': job.created_time,
-                        'creator_user_name': job.creator_user_name
-                    })
+            pattern = re.compile(job_name_pattern, re.IGNORECASE)
 
-            return matching_jobs
+            return [job for job in jobs if pattern.search(job['job_name'])]
 
         except Exception as e:
             raise Exception(f"Failed to search jobs: {str(e)}")
@@ -37,21 +112,24 @@ class DatabricksClient:
     async def get_job_runs(self, job_id: int, start_time: Optional[datetime] = None,
                           end_time: Optional[datetime] = None, limit: int = 50) -> List[Dict]:
         try:
+            now = datetime.now()
+
             if start_time is None:
-                start_time = datetime.now() - timedelta(days=7)
+                start_time = now - timedelta(days=7)
 
             if end_time is None:
-                end_time = datetime.now()
+                end_time = now
 
             start_time_ms = int(start_time.timestamp() * 1000)
             end_time_ms = int(end_time.timestamp() * 1000)
 
-            runs = list(self.client.jobs.list_runs(
+            runs = await _run_blocking(lambda: list(self.client.jobs.list_runs(
                 job_id=job_id,
                 start_time_from=start_time_ms,
                 start_time_to=end_time_ms,
-                limit=limit
-            ))
+                limit=limit,
+                expand_tasks=True
+            )))
 
             job_runs = []
             for run in runs:
@@ -59,18 +137,23 @@ class DatabricksClient:
                 if run.cluster_instance and run.cluster_instance.cluster_id:
                     cluster_id = run.cluster_instance.cluster_id
 
+                # Tasks come back inline (expand_tasks), so multi-task runs need
+                # no follow-up get_run call to find their clusters
+                task_cluster_ids = [
+                    task.cluster_instance.cluster_id
+                    for task in run.tasks or []
+                    if task.cluster_instance and task.cluster_instance.cluster_id
+                ]
+
                 job_runs.append({
                     'run_id': run.run_id,
                     'job_id': run.job_id,
                     'cluster_id': cluster_id,
+                    'task_cluster_ids': task_cluster_ids,
                     'run_name': run.run_name,
-                    'state': {
-                        'life_cycle_state': run.state.life_cycle_state.value if run.state else None,
-                        'result_state': run.state.result_state.value if run.state and run.state.result_state else None,
-                        'state_message': run.state.state_message if run.state else None
-                    },
-                    'start_time': datetime.fromtimestamp(run.start_time / 1000) if run.start_time else None,
-                    'end_time': datetime.fromtimestamp(run.end_time / 1000) if run.end_time else None,
+                    'state': _state_to_dict(run.state),
+                    'start_time': _from_epoch_ms(run.start_time),
+                    'end_time': _from_epoch_ms(run.end_time),
                     'execution_duration': run.execution_duration,
                     'creator_user_name': run.creator_user_name
                 })
@@ -82,7 +165,7 @@ class DatabricksClient:
 
     async def get_run_details(self, run_id: int) -> Dict:
         try:
-            run = self.client.jobs.get_run(run_id)
+            run = await _run_blocking(lambda: self.client.jobs.get_run(run_id))
 
             cluster_id = None
             if run.cluster_instance and run.cluster_instance.cluster_id:
@@ -98,12 +181,9 @@ class DatabricksClient:
                     tasks.append({
                         'task_key': task.task_key,
                         'cluster_id': task_cluster_id,
-                        'state': {
-                            'life_cycle_state': task.state.life_cycle_state.value if task.state else None,
-                            'result_state': task.state.result_state.value if task.state and task.state.result_state else None,
-                        },
-                        'start_time': datetime.fromtimestamp(task.start_time / 1000) if task.start_time else None,
-                        'end_time': datetime.fromtimestamp(task.end_time / 1000) if task.end_time else None,
+                        'state': _state_to_dict(task.state, include_message=False),
+                        'start_time': _from_epoch_ms(task.start_time),
+                        'end_time': _from_epoch_ms(task.end_time),
                     })
 
             return {
@@ -111,13 +191,9 @@ class DatabricksClient:
                 'job_id': run.job_id,
                 'cluster_id': cluster_id,
                 'run_name': run.run_name,
-                'state': {
-                    'life_cycle_state': run.state.life_cycle_state.value if run.state else None,
-                    'result_state': run.state.result_state.value if run.state and run.state.result_state else None,
-                    'state_message': run.state.state_message if run.state else None
-                },
-                'start_time': datetime.fromtimestamp(run.start_time / 1000) if run.start_time else None,
-                'end_time': datetime.fromtimestamp(run.end_time / 1000) if run.end_time else None,
+                'state': _state_to_dict(run.state),
+                'start_time': _from_epoch_ms(run.start_time),
+                'end_time': _from_epoch_ms(run.end_time),
                 'execution_duration': run.execution_duration,
                 'creator_user_name': run.creator_user_name,
                 'tasks': tasks,
@@ -130,23 +206,25 @@ class DatabricksClient:
     async def search_failed_runs(self, job_name_pattern: str = None,
                                hours_back: int = 24) -> List[Dict]:
         try:
-            start_time = datetime.now() - timedelta(hours=hours_back)
             end_time = datetime.now()
+            start_time = end_time - timedelta(hours=hours_back)
 
             jobs = []
             if job_name_pattern:
                 jobs = await self.search_jobs_by_name(job_name_pattern)
             else:
-                all_jobs = list(self.client.jobs.list())
-                jobs = [{'job_id': job.job_id, 'job_name': job.settings.name} for job in all_jobs]
+                jobs = await self._list_all_jobs()
 
-            failed_runs = []
-            for job in jobs:
-                runs = await self.get_job_runs(job['job_id'], start_time, end_time, limit=20)
+            runs_per_job = await self.gather_bounded(
+                self.get_job_runs(job['job_id'], start_time, end_time, limit=20) for job in jobs
+            )
 
+            failed_runs = []
+            for job, runs in zip(jobs, runs_per_job):
                 for run in runs:
-                    if (run['state']['result_state'] in ['FAILED', 'CANCELED', 'TIMEOUT'] or
-                        run['state']['life_cycle_state'] in ['INTERNAL_ERROR']):
+                    state = run['state']
+                    if (state['result_state'] in _FAILED_RESULT_STATES or
+                        state['life_cycle_state'] in _FAILED_LIFECYCLE_STATES):
 
                         failed_runs.append({
                             **run,
@@ -160,7 +238,7 @@ class DatabricksClient:
 
     async def get_cluster_logs_info(self, cluster_id: str) -> Dict:
         try:
-            cluster = self.client.clusters.get(cluster_id)
+            cluster = await _run_blocking(lambda: self.client.clusters.get(cluster_id))
 
             log_info = {
                 'cluster_id': cluster_id,
@@ -191,23 +269,22 @@ class DatabricksClient:
     async def get_cluster_ids_for_job(self, job_name_pattern: str,
                                     time_range: Tuple[datetime, datetime] = None) -> List[str]:
         if time_range is None:
-            start_time = datetime.now() - timedelta(hours=24)
             end_time = datetime.now()
+            start_time = end_time - timedelta(hours=24)
         else:
             start_time, end_time = time_range
 
         jobs = await self.search_jobs_by_name(job_name_pattern)
         cluster_ids = set()
 
-        for job in jobs:
-            runs = await self.get_job_runs(job['job_id'], start_time, end_time)
-            for run in runs:
+        runs_per_job = await self.gather_bounded(
+            self.get_job_runs(job['job_id'], start_time, end_time) for job in jobs
+        )
+
+        for job_runs in runs_per_job:
+            for run in job_runs:
                 if run['cluster_id']:
                     cluster_ids.add(run['cluster_id'])
-
-                run_details = await self.get_run_details(run['run_id'])
-                for task in run_details.get('tasks', []):
-                    if task.get('cluster_id'):
-                        cluster_ids.add(task['cluster_id'])
+                cluster_ids.update(run['task_cluster_ids'])
 
         return list(cluster_ids)
\ No newline at end of file
@@ -1,11 +1,91 @@
 import re
+import heapq
+import functools
+import itertools
 import asyncio
-from typing import List, Dict, Tuple, Optional
+from collections import Counter, defaultdict
+from typing import AsyncIterator, Iterator, List, Dict, Tuple, Optional, Pattern
 from dataclasses import dataclass
 from config.config import config
+from src.utils.log_types import log_type_for
+from src.utils.regex_prefilter import required_literal
+
+def _compile(pattern: str) -> Tuple[Pattern[str], Pattern[bytes], Optional[str]]:
+    """
+    Compile a case-insensitive pattern for str and for ASCII bytes, along with
+    the literal every match must contain.
+    """
+    compiled = re.compile(pattern, re.IGNORECASE)
+    return compiled, re.compile(pattern.encode(), re.IGNORECASE), required_literal(compiled)[0]
+
+def _ascii_lower(content: str) -> Optional[str]:
+    # None for non-ASCII text, where lower() and IGNORECASE can disagree
+    return content.lower() if content.isascii() else None
+
+def _may_match(literal: Optional[str], lowered: Optional[str]) -> bool:
+    """
+    Cheap substring precheck before running a pattern.
+
+    `lowered` is the lowercased chunk, or None when it isn't ASCII: lower() and
+    IGNORECASE only agree on ASCII text, so other chunks always run the regex.
+    """
+    return lowered is None or literal is None or literal in lowered
+
+@functools.lru_cache(maxsize=8)
+def _chunk_regex(lines_per_chunk: int) -> Pattern[str]:
+    # Up to lines_per_chunk lines, not including the newline after the last one
+    return re.compile(r'[^\n]*(?:\n[^\n]*){0,%d}' % (lines_per_chunk - 1))
+
+def _iter_chunks(content: str, lines_per_chunk: int) -> Iterator[str]:
+    """
+    Yield the same chunks as joining content.split('\n') in runs of lines_per_chunk.
+
+    Each chunk is one regex match sliced straight from content, so no per-line
+    list is built; this is also about twice as fast as split plus join.
+    """
+    chunk_regex = _chunk_regex(lines_per_chunk)
+    pos, content_end = 0, len(content)
+    while True:
+        match = chunk_regex.match(content, pos)
+        yield match.group()
+        if match.end() >= content_end:
+            return
+        # Skip the newline that separates this chunk from the next
+        pos = match.end() + 1
+
+@functools.lru_cache(maxsize=32)
+def _query_regex(search_query: str) -> Pattern[str]:
+    # Every chunk of an analysis scores against the same query
+    return re.compile(re.escape(search_query), re.IGNORECASE)
+
+# Rank used to order error summaries, most severe first
+_SEVERITY_RANK = {'critical': 4, 'high': 3, 'medium': 2, 'low': 1}
+
+def _error_sort_key(error: 'ErrorSummary') -> Tuple[int, int]:
+    return _SEVERITY_RANK.get(error.severity, 0), error.frequency
+
+# Generic keywords that raise a chunk's priority, with their per-match weight
+_ERROR_KEYWORDS = [
+    (*_compile(keyword_pattern), weight)
+    for keyword_pattern, weight in (
+        (r'\bfatal\b', 2.0),
+        (r'\bcritical\b', 2.0),
+        (r'\bsevere\b', 1.8),
+        (r'\berror\b', 1.5),
+        (r'\bexception\b', 1.5),
+        (r'\bfailed\b', 1.2),
+        (r'\bfailure\b', 1.2),
+        (r'\bwarning\b', 0.8),
+        (r'\bwarn\b', 0.8)
+    )
+]
 
 @dataclass
 class LogChunk:
+    # Slots spelled out for Python 3.9, which lacks dataclass(slots=True)
+    __slots__ = ('content', 'chunk_id', 'file_name', 'log_type',
+                 'priority_score', 'error_indicators')
+
     content: str
     chunk_id: int
     file_name: str
@@ -15,6 +95,9 @@ class LogChunk:
 
 @dataclass
 class ErrorSummary:
+    __slots__ = ('error_type', 'description', 'frequency', 'severity',
+                 'suggested_solution', 'relevant_logs')
+
     error_type: str
     description: str
     frequency: int
@@ -22,6 +105,42 @@ class ErrorSummary:
     suggested_solution: str
     relevant_logs: List[str]
 
+class _ErrorTally:
+    """
+    Error indicator counts over a run of chunks, plus the files of the
+    highest-priority few chunks per type, so scored chunks need not be kept.
+    """
+
+    __slots__ = ('counts', '_examples')
+
+    # File names kept per error type for the summary
+    MAX_EXAMPLES = 3
+
+    def __init__(self):
+        self.counts = Counter()
+        # error type -> min-heap of (score, -chunk_id, -position, file_name)
+        self._examples = defaultdict(list)
+
+    def add(self, chunk: LogChunk) -> None:
+        for position, error_type in enumerate(chunk.error_indicators):
+            self.counts[error_type] += 1
+            entry = (chunk.priority_score, -chunk.chunk_id, -position, chunk.file_name)
+            examples = self._examples[error_type]
+            if len(examples) < self.MAX_EXAMPLES:
+                heapq.heappush(examples, entry)
+            else:
+                heapq.heappushpop(examples, entry)
+
+    def items(self) -> Iterator[Tuple[str, int, List[str]]]:
+        """
+        Yield (error_type, count, files), with types and files in the order a
+        scan of the chunks sorted by priority would first meet them.
+        """
+        ranked = {error_type: sorted(examples, reverse=True)
+                  for error_type, examples in self._examples.items()}
+        for error_type in sorted(ranked, key=lambda t: ranked[t][0], reverse=True):
+            yield error_type, self.counts[error_type], [entry[-1] for entry in ranked[error_type]]
+
 class LogAnalyzer:
     def __init__(self):
         self.max_token_limit = config.max_token_limit
@@ -263,6 +382,30 @@ class LogAnalyzer:
             }
         }
 
+        # Compiled once per analyzer, each with the literal every match must contain.
+        # Patterns stay separate rather than grouped into alternations: scores
+        # count matches per pattern, and the literal precheck already skips most
+        # patterns outright (about 15x faster than first-letter groups on clean chunks)
+        self._compiled_patterns = {
+            error_type: [_compile(pattern) for pattern in config['patterns']]
+            for error_type, config in self.error_patterns.items()
+        }
+
+        # Error types from highest to lowest priority, for iterative analysis
+        self._error_types_by_priority = tuple(sorted(
+            self.error_patterns,
+            key=lambda error_type: self.error_patterns[error_type].get('priority', 50),
+            reverse=True
+        ))
+
+        # (severity weight, priority weight) per error type, for chunk scoring
+        severity_weights = {'critical': 5.0, 'high': 3.0, 'medium': 2.0, 'low': 1.0}
+        self._score_weights = {
+            error_type: (severity_weights.get(config['severity'], 0.5),
+                         config.get('priority', 50) / 100.0)
+            for error_type, config in self.error_patterns.items()
+        }
+
         self.solution_templates = {
             'Memory Management': [
                 "Increase driver memory: --driver-memory 8g or spark.driver.memory=8g",
@@ -376,15 +519,56 @@ class LogAnalyzer:
 
     async def analyze_logs(self, log_content: Dict[str, str],
                           search_query: Optional[str] = None) -> Dict[str, any]:
-        chunked_logs = await self._chunk_and_prioritize_logs(log_content, search_query)
-        error_summary = await self._analyze_errors(chunked_logs)
-        optimized_content = await self._create_optimized_summary(chunked_logs, error_summary)
+        # Errors are tallied over every chunk, but only the top ten are kept
+        tally = _ErrorTally()
+        chunked_logs = await self._chunk_and_prioritize_logs(
+            log_content, search_query, max_chunks=10, tally=tally
+        )
+        error_summary = self._summarize_errors(tally)
+        optimized_content, token_estimate = await self._create_optimized_summary(
+            chunked_logs, error_summary
+        )
+
+        return {
+            'error_summary': error_summary,
+            'prioritized_chunks': chunked_logs,
+            'optimized_content': optimized_content,
+            'token_estimate': token_estimate
+        }
+
+    async def analyze_logs_streaming(self, log_stream: AsyncIterator[Tuple[str, str]],
+                                   search_query: Optional[str] = None,
+                                   max_chunks: int = 10) -> Dict[str, any]:
+        """
+        Analyze (file_name, content) pairs one file at a time.
+
+        Only error counts and the top `max_chunks` chunks are kept between files,
+        so peak memory is bounded by the largest single file rather than the sum.
+        """
+        top_chunks: List[LogChunk] = []
+        # One tally and one id sequence for the whole stream, as if the files
+        # had been chunked together
+        tally = _ErrorTally()
+        chunk_ids = itertools.count()
+
+        async for file_name, content in log_stream:
+            chunks = await self._chunk_and_prioritize_logs(
+                {file_name: content}, search_query, max_chunks=max_chunks,
+                tally=tally, chunk_ids=chunk_ids
+            )
+            top_chunks = heapq.nlargest(max_chunks, top_chunks + chunks,
+                                        key=lambda x: (x.priority_score, -x.chunk_id))
+
+        error_summary = self._summarize_errors(tally)
+        optimized_content, token_estimate = await self._create_optimized_summary(
+            top_chunks, error_summary
+        )
 
         return {
             'error_summary': error_summary,
-            'prioritized_chunks': chunked_logs[:10],
+            'prioritized_chunks': top_chunks,
             'optimized_content': optimized_content,
-            'token_estimate': self._estimate_tokens(optimized_content)
+            'token_estimate': token_estimate
         }
 
     async def analyze_logs_iteratively(self, log_content: Dict[str, str],
@@ -399,35 +583,28 @@ class LogAnalyzer:
         iteration_results = []
         token_budget = self.max_token_limit
 
-        # Sort error patterns by priority
-        sorted_patterns = sorted(
-            self.error_patterns.items(),
-            key=lambda x: x[1].get('priority', 50),
-            reverse=True
-        )
-
         for iteration in range(max_iterations):
             if iteration == 0:
                 # First iteration: Focus on critical errors only
-                target_patterns = {k: v for k, v in sorted_patterns[:3]}  # Top 3 priority patterns
+                target_types = self._error_types_by_priority[:3]  # Top 3 priority patterns
                 chunk_limit = 5
             elif iteration == 1:
                 # Second iteration: Include high-severity errors
-                target_patterns = {k: v for k, v in sorted_patterns[:6]}  # Top 6 patterns
+                target_types = self._error_types_by_priority[:6]  # Top 6 patterns
                 chunk_limit = 10
             else:
                 # Final iteration: Comprehensive search
-                target_patterns = dict(sorted_patterns)
+                target_types = self._error_types_by_priority
                 chunk_limit = 20
 
             # Analyze with current pattern set
             iteration_result = await self._analyze_iteration(
-                log_content, search_query, target_patterns, chunk_limit, token_budget
+                log_content, search_query, target_types, chunk_limit, token_budget
             )
 
             iteration_results.append({
                 'iteration': iteration + 1,
-                'patterns_searched': list(target_patterns.keys()),
+                'patterns_searched': list(target_types),
                 'errors_found': len(iteration_result['errors']),
                 'chunks_analyzed': len(iteration_result['chunks']),
                 'token_usage': iteration_result['token_usage']
@@ -450,12 +627,10 @@ class LogAnalyzer:
 
         # Deduplicate and sort errors
         unique_errors = self._deduplicate_errors(all_errors)
-        sorted_errors = sorted(unique_errors,
-                             key=lambda x: (x.severity, x.frequency),
-                             reverse=True)
+        sorted_errors = sorted(unique_errors, key=_error_sort_key, reverse=True)
 
         # Create final summary
-        final_summary = await self._create_iterative_summary(
+        final_summary, token_estimate = await self._create_iterative_summary(
             analyzed_chunks, sorted_errors, iteration_results
         )
 
@@ -463,66 +638,57 @@ class LogAnalyzer:
             'error_summary': sorted_errors,
             'prioritized_chunks': analyzed_chunks[:15],
             'optimized_content': final_summary,
-            'token_estimate': self._estimate_tokens(final_summary),
+            'token_estimate': token_estimate,
             'iteration_breakdown': iteration_results,
             'total_iterations': len(iteration_results)
         }
 
     async def _analyze_iteration(self, log_content: Dict[str, str],
                                search_query: Optional[str],
-                               target_patterns: Dict[str, Dict],
+                               target_types: Tuple[str, ...],
                                chunk_limit: int,
                                token_budget: int) -> Dict[str, any]:
         """
-        Analyze logs for a specific iteration with given patterns.
+        Analyze logs for a specific iteration restricted to the given error types.
         """
-        # Temporarily override patterns for this iteration
-        original_patterns = self.error_patterns
-        self.error_patterns = target_patterns
-
-        try:
-            chunked_logs = await self._chunk_and_prioritize_logs(log_content, search_query)
-            limited_chunks = chunked_logs[:chunk_limit]
+        # Restrict matching to this iteration's error types without touching
+        # self.error_patterns, which the scoring thread reads concurrently
+        limited_chunks = await self._chunk_and_prioritize_logs(
+            log_content, search_query, target_types, max_chunks=chunk_limit
+        )
 
-            error_summary = await self._analyze_errors(limited_chunks)
+        error_summary = await self._analyze_errors(limited_chunks)
 
-            # Estimate token usage for this iteration
-            content_sample = '\n'.join([chunk.content[:500] for chunk in limited_chunks[:5]])
-            token_usage = self._estimate_tokens(content_sample)
+        # Estimate token usage for this iteration
+        content_sample = '\n'.join([chunk.content[:500] for chunk in limited_chunks[:5]])
+        token_usage = self._estimate_tokens(content_sample)
 
-            return {
-                'errors': error_summary,
-                'chunks': limited_chunks,
-                'token_usage': min(token_usage, token_budget)
-            }
-        finally:
-            # Restore original patterns
-            self.error_patterns = original_patterns
+        return {
+            'errors': error_summary,
+            'chunks': limited_chunks,
+            'token_usage': min(token_usage, token_budget)
+        }
 
     def _deduplicate_errors(self, errors: List[ErrorSummary]) -> List[ErrorSummary]:
         """
         Remove duplicate errors based on error type and description.
         """
-        seen = set()
-        unique_errors = []
+        unique_errors: Dict[Tuple[str, str], ErrorSummary] = {}
 
         for error in errors:
             key = (error.error_type, error.description)
-            if key not in seen:
-                seen.add(key)
-                unique_errors.append(error)
+            existing = unique_errors.get(key)
+            if existing is None:
+                unique_errors[key] = error
             else:
                 # Merge frequency counts for duplicates
-                for existing in unique_errors:
-                    if (existing.error_type, existing.description) == key:
-                        existing.frequency += error.frequency
-                        break
+                existing.frequency += error.frequency
 
-        return unique_errors
+        return list(unique_errors.values())
 
     async def _create_iterative_summary(self, chunks: List[LogChunk],
                                        errors: List[ErrorSummary],
-                                       iteration_results: List[Dict]) -> str:
+                                       iteration_results: List[Dict]) -> Tuple[str, float]:
         """
         Create an optimized summary from iterative analysis.
         """
@@ -566,7 +732,8 @@ class LogAnalyzer:
 
         # Most relevant log excerpts
         summary_parts.append("📋 MOST RELEVANT LOG EXCERPTS:")
-        top_chunks = sorted(chunks, key=lambda x: x.priority_score, reverse=True)[:3]
+        # Only three excerpts are shown; no need to order every analyzed chunk
+        top_chunks = heapq.nlargest(3, chunks, key=lambda x: x.priority_score)
 
         for i, chunk in enumerate(top_chunks):
             summary_parts.append(f"\n--- Excerpt {i+1} from {chunk.file_name} ---")
@@ -575,36 +742,53 @@ class LogAnalyzer:
             if len(chunk.content) > 800:
                 summary_parts.append("... (truncated)")
 
-        full_summary = '\n'.join(summary_parts)
-
-        # Truncate if needed
-        if self._estimate_tokens(full_summary) > self.max_token_limit:
-            return self._truncate_to_token_limit(full_summary)
-
-        return full_summary
+        return self._finish_summary(summary_parts)
 
     async def _chunk_and_prioritize_logs(self, log_content: Dict[str, str],
-                                       search_query: Optional[str] = None) -> List[LogChunk]:
+                                       search_query: Optional[str] = None,
+                                       error_types: Optional[Tuple[str, ...]] = None,
+                                       max_chunks: Optional[int] = None,
+                                       tally: Optional[_ErrorTally] = None,
+                                       chunk_ids: Optional[Iterator[int]] = None) -> List[LogChunk]:
+        """
+        Score every chunk and return them by priority, or only the top
+        `max_chunks`. Each scored chunk is also added to `tally` if given,
+        and takes its id from `chunk_ids` if given, else counts from 0.
+        """
+        # Scoring is pure regex work. re holds the GIL, so a thread buys no
+        # parallelism, but it keeps the event loop free for downloads meanwhile.
+        # A process pool would parallelize it, but every file would be pickled
+        # across to the workers, and forking the agent process is not safe once
+        # the SDK's thread pools are running
+        return await asyncio.to_thread(self._chunk_and_prioritize_logs_sync,
+                                       log_content, search_query, error_types,
+                                       max_chunks, tally, chunk_ids)
+
+    def _chunk_and_prioritize_logs_sync(self, log_content: Dict[str, str],
+                                        search_query: Optional[str] = None,
+                                        error_types: Optional[Tuple[str, ...]] = None,
+                                        max_chunks: Optional[int] = None,
+                                        tally: Optional[_ErrorTally] = None,
+                                        chunk_ids: Optional[Iterator[int]] = None) -> List[LogChunk]:
         chunks = []
-        chunk_id = 0
+        # With a limit, a min-heap of (score, -chunk_id, chunk) holds only the
+        # best chunks so far; the rest are dropped as soon as they're outscored
+        top_chunks = []
+        chunk_ids = chunk_ids if chunk_ids is not None else itertools.count()
+        lines_per_chunk = self.chunk_size // 100
 
         for file_name, content in log_content.items():
             log_type = self._determine_log_type(file_name)
-            lines = content.split('\n')
-
-            for i in range(0, len(lines), self.chunk_size // 100):
-                chunk_lines = lines[i:i + self.chunk_size // 100]
-                chunk_content = '\n'.join(chunk_lines)
-
-                if len(chunk_content.strip()) == 0:
+            for chunk_content in _iter_chunks(content, lines_per_chunk):
+                # Blank chunks carry nothing to score; isspace() avoids a stripped copy
+                if not chunk_content or chunk_content.isspace():
                     continue
 
-                priority_score = await self._calculate_priority_score(
-                    chunk_content, log_type, search_query
+                chunk_id = next(chunk_ids)
+                priority_score, error_indicators = self._score_chunk(
+                    chunk_content, log_type, search_query, error_types
                 )
 
-                error_indicators = self._find_error_indicators(chunk_content)
-
                 chunk = LogChunk(
                     content=chunk_content,
                     chunk_id=chunk_id,
@@ -614,14 +798,31 @@ class LogAnalyzer:
                     error_indicators=error_indicators
                 )
 
-                chunks.append(chunk)
-                chunk_id += 1
-
+                if tally is not None:
+                    tally.add(chunk)
+                if max_chunks is None:
+                    chunks.append(chunk)
+                elif len(top_chunks) < max_chunks:
+                    heapq.heappush(top_chunks, (priority_score, -chunk_id, chunk))
+                else:
+                    heapq.heappushpop(top_chunks, (priority_score, -chunk_id, chunk))
+
+        if max_chunks is not None:
+            # Same order as the stable sort below: ties keep the earlier chunk first
+            return [chunk for _, _, chunk in sorted(top_chunks, reverse=True)]
         return sorted(chunks, key=lambda x: x.priority_score, reverse=True)
 
-    async def _calculate_priority_score(self, content: str, log_type: str,
-                                      search_query: Optional[str] = None) -> float:
+    def _score_chunk(self, content: str, log_type: str,
+                     search_query: Optional[str] = None,
+                     error_types: Optional[Tuple[str, ...]] = None) -> Tuple[float, List[str]]:
+        """
+        Score a chunk and list its error indicators in the same pass.
+
+        An error type is an indicator exactly when one of its patterns counted a
+        match, so the per-pattern counts answer both questions.
+        """
         score = 0.0
+        error_indicators = []
 
         log_type_weights = {
             'stderr': 1.0,
@@ -634,81 +835,52 @@ class LogAnalyzer:
 
         score += log_type_weights.get(log_type, 0.1)
 
-        for error_type, config in self.error_patterns.items():
-            for pattern in config['patterns']:
-                matches = len(re.findall(pattern, content, re.IGNORECASE))
+        lowered = _ascii_lower(content)
+
+        # ASCII chunks are counted as bytes, which re scans up to 3x faster than str
+        data = content.encode() if lowered is not None else None
+
+        for error_type in error_types or self.error_patterns:
+            severity_weight, priority_weight = self._score_weights[error_type]
+            matched = False
+            for pattern, bytes_pattern, literal in self._compiled_patterns[error_type]:
+                if not _may_match(literal, lowered):
+                    continue
+                matches = len(pattern.findall(content) if data is None else bytes_pattern.findall(data))
                 if matches > 0:
-                    severity_weight = {'critical': 5.0, 'high': 3.0, 'medium': 2.0, 'low': 1.0}.get(
-                        config['severity'], 0.5
-                    )
-                    priority_weight = config.get('priority', 50) / 100.0
                     score += matches * severity_weight * priority_weight
+                    matched = True
+            if matched:
+                error_indicators.append(error_type)
 
         if search_query:
-            query_matches = len(re.findall(re.escape(search_query), content, re.IGNORECASE))
+            # A literal, case-insensitive count is just str.count on ASCII text
+            if lowered is not None and search_query.isascii():
+                query_matches = lowered.count(search_query.lower())
+            else:
+                query_matches = len(_query_regex(search_query).findall(content))
             score += query_matches * 2.0
 
-        error_keywords = [
-            (r'\bfatal\b', 2.0),
-            (r'\bcritical\b', 2.0),
-            (r'\bsevere\b', 1.8),
-            (r'\berror\b', 1.5),
-            (r'\bexception\b', 1.5),
-            (r'\bfailed\b', 1.2),
-            (r'\bfailure\b', 1.2),
-            (r'\bwarning\b', 0.8),
-            (r'\bwarn\b', 0.8)
-        ]
-
-        for keyword_pattern, weight in error_keywords:
-            matches = len(re.findall(keyword_pattern, content, re.IGNORECASE))
+        for keyword_pattern, bytes_pattern, literal, weight in _ERROR_KEYWORDS:
+            if not _may_match(literal, lowered):
+                continue
+            matches = len(keyword_pattern.findall(content) if data is None else bytes_pattern.findall(data))
             score += matches * weight
 
-        return score
+        return score, error_indicators
 
     def _determine_log_type(self, file_name: str) -> str:
-        file_name = file_name.lower()
-        if 'stderr' in file_name:
-            return 'stderr'
-        elif 'stdout' in file_name:
-            return 'stdout'
-        elif 'log4j' in file_name:
-            return 'log4j'
-        elif 'driver' in file_name:
-            return 'driver'
-        elif 'executor' in file_name:
-            return 'executor'
-        else:
-            return 'unknown'
-
-    def _find_error_indicators(self, content: str) -> List[str]:
-        indicators = []
-        for error_type, config in self.error_patterns.items():
-            for pattern in config['patterns']:
-                if re.search(pattern, content, re.IGNORECASE):
-                    indicators.append(error_type)
-                    break
-        return indicators
+        return log_type_for(file_name)
 
     async def _analyze_errors(self, chunks: List[LogChunk]) -> List[ErrorSummary]:
-        error_counts = {}
-        error_examples = {}
-
+        tally = _ErrorTally()
         for chunk in chunks:
-            for error_indicator in chunk.error_indicators:
-                if error_indicator not in error_counts:
-                    error_counts[error_indicator] = 0
-                    error_examples[error_indicator] = []
-
-                error_counts[error_indicator] += 1
-                if len(error_examples[error_indicator]) < 3:
-                    error_examples[error_indicator].append({
-                        'file': chunk.file_name,
-                        'content': chunk.content[:500]
-                    })
+            tally.add(chunk)
+        return self._summarize_errors(tally)
 
+    def _summarize_errors(self, tally: _ErrorTally) -> List[ErrorSummary]:
         summaries = []
-        for error_type, count in error_counts.items():
+        for error_type, count, files in tally.items():
             if error_type in self.error_patterns:
                 config = self.error_patterns[error_type]
                 category = config['category']
@@ -719,18 +891,15 @@ class LogAnalyzer:
                     frequency=count,
                     severity=config['severity'],
                     suggested_solution='; '.join(self.solution_templates.get(category, [])),
-                    relevant_logs=[ex['file'] for ex in error_examples[error_type]]
+                    relevant_logs=files
                 )
                 summaries.append(summary)
 
         # Sort by severity priority and frequency
-        severity_priority = {'critical': 4, 'high': 3, 'medium': 2, 'low': 1}
-        return sorted(summaries,
-                     key=lambda x: (severity_priority.get(x.severity, 0), x.frequency),
-                     reverse=True)
+        return sorted(summaries, key=_error_sort_key, reverse=True)
 
     async def _create_optimized_summary(self, chunks: List[LogChunk],
-                                      error_summary: List[ErrorSummary]) -> str:
+                                      error_summary: List[ErrorSummary]) -> Tuple[str, float]:
         summary_parts = []
 
         summary_parts.append("=== LOG ANALYSIS SUMMARY ===\n")
@@ -751,23 +920,39 @@ class LogAnalyzer:
             if len(chunk.content) > 1000:
                 summary_parts.append("... (truncated)")
 
-        full_summary = '\n'.join(summary_parts)
+        return self._finish_summary(summary_parts)
 
-        if self._estimate_tokens(full_summary) > self.max_token_limit:
-            return self._truncate_to_token_limit(full_summary)
+    def _finish_summary(self, summary_parts: List[str]) -> Tuple[str, float]:
+        """
+        Join summary lines, dropping trailing ones past the token limit.
 
-        return full_summary
+        Words are tallied per part as the lines are taken, so the joined text
+        is never split again. Returns the summary with its token estimate.
+        """
+        word_budget = int(self.max_token_limit / 1.3)
+        part_words = []
+        words = 0
+
+        for part in summary_parts:
+            # Same separator count as _estimate_tokens; each join newline is one
+            count = part.count(' ') + part.count('\n') + 1
+            if words + count > word_budget:
+                notice = f"\n... (Content truncated to stay within {self.max_token_limit} token limit)"
+                notice_words = notice.count(' ') + notice.count('\n') + 1
+                # Make room for the notice itself
+                while part_words and words + notice_words > word_budget:
+                    words -= part_words.pop()
+                kept = summary_parts[:len(part_words)]
+                kept.append(notice)
+                return '\n'.join(kept), (words + notice_words) * 1.3
+
+            part_words.append(count)
+            words += count
+
+        return '\n'.join(summary_parts), words * 1.3
 
     def _estimate_tokens(self, text: str) -> int:
-        return len(text.split()) * 1.3
-
-    def _truncate_to_token_limit(self, text: str) -> str:
-        words = text.split()
-        target_words = int(self.max_token_limit / 1.3)
-
-        if len(words) <= target_words:
-            return text
-
-        truncated = ' '.join(words[:target_words])
-        truncated += f"\n\n... (Content truncated to stay within {self.max_token_limit} token limit)"
-        return truncated
\ No newline at end of file
+        # ~1.3 tokens per word; counting separators instead of splitting avoids
+        # building a list of every word. Runs of spaces count extra, which only
+        # errs on the safe side of the limit.
+        return (text.count(' ') + text.count('\n') + 1) * 1.3
\ No newline at end of file
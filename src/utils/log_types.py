@@ -0,0 +1,11 @@
+import functools
+
+# Log types by file name marker, checked in order
+LOG_TYPE_MARKERS = ('stderr', 'stdout', 'log4j', 'driver', 'executor')
+
+@functools.lru_cache(maxsize=1024)
+def log_type_for(file_name: str) -> str:
+    """Return the first marker found in `file_name` (case-insensitive), else 'unknown'."""
+    # Cluster log names repeat across analyses (stderr, log4j-active.log, ...)
+    file_name = file_name.lower()
+    return next((marker for marker in LOG_TYPE_MARKERS if marker in file_name), 'unknown')
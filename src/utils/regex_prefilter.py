@@ -0,0 +1,38 @@
+import re
+import functools
+from typing import Optional, Pattern, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+@functools.lru_cache(maxsize=256)
+def required_literal(pattern: Pattern[str]) -> Tuple[Optional[str], bool]:
+    """
+    Return the longest literal every match of `pattern` must contain (lowercased),
+    and whether the pattern is nothing but that literal.
+
+    Only top-level literals are considered, so the result is always safe to use as
+    a prefilter: a line without the literal cannot match.
+    """
+    try:
+        parsed = list(sre_parse.parse(pattern.pattern, pattern.flags))
+    except Exception:
+        return None, False
+
+    longest, current = '', []
+    for op, value in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(chr(value))
+            continue
+        if len(current) > len(longest):
+            longest = ''.join(current)
+        current = []
+    if len(current) > len(longest):
+        longest = ''.join(current)
+
+    if len(longest) < 3 or not longest.isascii():
+        return None, False
+    literal_only = len(longest) == len(parsed) and bool(pattern.flags & re.IGNORECASE)
+    return longest.lower(), literal_only
@@ -1,310 +1,720 @@
 import boto3
-import gzip
+try:
+    # python-isal decompresses gzip several times faster when installed
+    from isal import igzip as _gzip
+except ImportError:
+    import gzip as _gzip
 import asyncio
-import aiofiles
-from typing import List, Dict, Optional, AsyncGenerator
+import functools
+from collections import deque
+from bisect import bisect_right
+from typing import Callable, List, Dict, Iterator, NamedTuple, Optional, AsyncGenerator, Pattern, Tuple, Union
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError, NoCredentialsError
 from config.config import config
-import tempfile
+from src.utils.log_types import log_type_for
+from src.utils.regex_prefilter import required_literal
 import os
+import time
 from datetime import datetime
 import re
 
+class LogFile(NamedTuple):
+    """A log object listed under a cluster's S3 log prefix."""
+    key: str
+    file_name: str
+    size: int
+    last_modified: str
+    log_type: str
+
+# Rank of each log type when searching files (most likely to contain errors first)
+_LOG_TYPE_PRIORITY = {
+    log_type: rank for rank, log_type in
+    enumerate(('stderr', 'log4j', 'driver', 'executor', 'stdout', 'unknown'))
+}
+
+# Enhanced comprehensive error patterns
+_DEFAULT_PATTERN_SOURCES = {
+    'critical_errors': [
+        r'(?i)\bfatal\s+error\b',
+        r'(?i)\bcritical\s+error\b',
+        r'(?i)\boutofmemoryerror\b',
+        r'(?i)\bsegmentation\s+fault\b',
+        r'(?i)\bcore\s+dumped\b',
+        r'(?i)\bpanic\b.*\berror\b',
+        r'(?i)\bcrash\b.*\berror\b'
+    ],
+    'spark_errors': [
+        r'(?i)\banalysisexception\b',
+        r'(?i)\bsparkexception\b',
+        r'(?i)org\.apache\.spark\..*exception',
+        r'(?i)\bjob\s+\d+\s+failed\b',
+        r'(?i)\bstage\s+\d+\s+failed\b',
+        r'(?i)\btask\s+failed\b',
+        r'(?i)\bexecutor\s+lost\b',
+        r'(?i)\bdriver\s+stacktrace\b',
+        r'(?i)\bshuffle\s+fetch\s+failed\b'
+    ],
+    'memory_issues': [
+        r'(?i)\boutofmemoryerror\b',
+        r'(?i)java\.lang\.outofmemoryerror',
+        r'(?i)\bcontainer\s+killed.*memory\b',
+        r'(?i)\bgc\s+overhead\s+limit\b',
+        r'(?i)\bheap\s+space\s+exhausted\b',
+        r'(?i)\bmetaspace\s+out\s+of\s+memory\b',
+        r'(?i)\bdirect\s+buffer\s+memory\b'
+    ],
+    'io_errors': [
+        r'(?i)\bfilenotfoundexception\b',
+        r'(?i)\bioexception\b',
+        r'(?i)\bno\s+such\s+file\s+or\s+directory\b',
+        r'(?i)\bpermission\s+denied\b',
+        r'(?i)\baccess\s+denied\b',
+        r'(?i)\bdisk\s+space\s+exhausted\b',
+        r'(?i)\bno\s+space\s+left\s+on\s+device\b',
+        r'(?i)\bread\s+timed\s+out\b'
+    ],
+    'network_errors': [
+        r'(?i)\bconnection\s+refused\b',
+        r'(?i)\bconnection\s+timeout\b',
+        r'(?i)\bconnection\s+reset\b',
+        r'(?i)\bunknownhostexception\b',
+        r'(?i)\bsockettimeoutexception\b',
+        r'(?i)\bnetwork\s+is\s+unreachable\b',
+        r'(?i)\bhost\s+is\s+unreachable\b',
+        r'(?i)\bbroken\s+pipe\b'
+    ],
+    'application_errors': [
+        r'(?i)\bnullpointerexception\b',
+        r'(?i)\bclassnotfoundexception\b',
+        r'(?i)\bclasscastexception\b',
+        r'(?i)\bnumberformatexception\b',
+        r'(?i)\billegalargumentexception\b',
+        r'(?i)\billegalstateexception\b',
+        r'(?i)\bunsupportedoperationexception\b',
+        r'(?i)\bruntimeexception\b'
+    ],
+    'authentication_errors': [
+        r'(?i)\bauthentication\s+failed\b',
+        r'(?i)\bauthorization\s+failed\b',
+        r'(?i)\baccess\s+token\s+expired\b',
+        r'(?i)\binvalid\s+credentials\b',
+        r'(?i)\bunauthorized\s+access\b',
+        r'(?i)\bforbidden\s+access\b',
+        r'(?i)\bssl\s+certificate\s+error\b'
+    ],
+    'configuration_errors': [
+        r'(?i)\bconfiguration\s+error\b',
+        r'(?i)\binvalid\s+configuration\b',
+        r'(?i)\bmissing\s+configuration\b',
+        r'(?i)\bproperty\s+not\s+found\b',
+        r'(?i)\benvironment\s+variable\s+not\s+set\b',
+        r'(?i)\bclasspath\s+error\b',
+        r'(?i)\blibrary\s+not\s+found\b'
+    ]
+}
+
+# Compiled once at import rather than for every file searched. Each pattern is
+# scanned on its own: a per-category alternation measured over twice as slow
+# under re, defeats the per-pattern literal prefilter, and would drop matches
+# that two patterns of a category share
+_DEFAULT_ERROR_PATTERNS = {
+    category: [re.compile(pattern, re.IGNORECASE | re.MULTILINE) for pattern in patterns]
+    for category, patterns in _DEFAULT_PATTERN_SOURCES.items()
+}
+
+# Timestamp taken from each matched line
+_TIMESTAMP = re.compile(r'\d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2}')
+
+@functools.lru_cache(maxsize=256)
+def _compile_pattern(pattern: str) -> Pattern[str]:
+    # Custom pattern strings repeat across every file of a search and across searches
+    return re.compile(pattern, re.IGNORECASE | re.MULTILINE)
+
+@functools.lru_cache(maxsize=256)
+def _bytes_pattern(pattern: Pattern[str]) -> Optional[Pattern[bytes]]:
+    """The same pattern for ASCII bytes, or None if it can't be expressed as one."""
+    try:
+        return re.compile(pattern.pattern.encode(), pattern.flags & ~re.UNICODE)
+    except re.error:
+        return None
+
+def _match_spans(content: Union[str, bytes], lowered: Union[str, bytes, None],
+                 data: Optional[bytes], pattern: Pattern[str]) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (start, end) of each non-overlapping match of pattern in content.
+
+    lowered and data are the lowercased and encoded content, or None when it
+    isn't ASCII; ASCII content may also arrive as bytes already. Pure-literal
+    patterns are found with find, and the rest run as bytes regexes, which is
+    faster than str matching; offsets agree because every character is one byte.
+    """
+    literal, literal_only = required_literal(pattern)
+    if lowered is not None and literal_only:
+        if isinstance(lowered, bytes):
+            literal = literal.encode()
+        pos = lowered.find(literal)
+        while pos != -1:
+            yield pos, pos + len(literal)
+            pos = lowered.find(literal, pos + len(literal))
+        return
+
+    bytes_pattern = _bytes_pattern(pattern) if data is not None else None
+    if bytes_pattern is not None:
+        matches = bytes_pattern.finditer(data)
+    else:
+        matches = pattern.finditer(content.decode('ascii') if isinstance(content, bytes) else content)
+    for match in matches:
+        yield match.span()
+
+def _line_match_contexts(content: str, pattern: Pattern[str], around_lines: int):
+    """Yield (line index, first context index, context lines) for each matching line."""
+    lines = content.split('\n')
+    for i, line in enumerate(lines):
+        if pattern.search(line):
+            start = max(0, i - around_lines)
+            yield i, start, lines[start:i + around_lines + 1]
+
+def _newline(content: Union[str, bytes]) -> Union[str, bytes]:
+    return b'\n' if isinstance(content, bytes) else '\n'
+
+def _line_bounds(content: Union[str, bytes], pos: int) -> Tuple[int, int]:
+    """Start and end offsets of the line containing pos, without its newline."""
+    newline = _newline(content)
+    line_end = content.find(newline, pos)
+    return content.rfind(newline, 0, pos) + 1, len(content) if line_end == -1 else line_end
+
+def _context_bounds(content: Union[str, bytes], line_start: int, line_end: int,
+                    around_lines: int) -> Tuple[int, int, int]:
+    """
+    Widen a line's bounds by up to around_lines lines on each side.
+
+    Returns the new start and end offsets and how many lines were added before.
+    """
+    newline = _newline(content)
+    size = len(content)
+    context_start, before = line_start, 0
+    while before < around_lines and context_start > 0:
+        context_start = content.rfind(newline, 0, context_start - 1) + 1
+        before += 1
+
+    context_end, after = line_end, 0
+    while after < around_lines and context_end < size:
+        next_break = content.find(newline, context_end + 1)
+        context_end = size if next_break == -1 else next_break
+        after += 1
+
+    return context_start, context_end, before
+
+class _LineNumbers:
+    """
+    Line numbers for offsets into a text, counted from the nearest offset
+    already resolved rather than from a split of the whole text.
+
+    Ascending lookups scan the text once. Lookups out of order (matches of a
+    later pattern in the same category) count from whichever resolved
+    neighbour is nearer, so at worst the text is scanned O(log matches) times.
+    """
+
+    __slots__ = ('_text', '_newline', '_offsets', '_lines')
+
+    def __init__(self, text: Union[str, bytes]):
+        self._text = text
+        self._newline = _newline(text)
+        self._offsets = [0]
+        self._lines = [0]
+
+    def line_of(self, pos: int) -> int:
+        """0-based number of the line containing pos."""
+        i = bisect_right(self._offsets, pos) - 1
+        below = self._offsets[i]
+        if i + 1 < len(self._offsets) and self._offsets[i + 1] - pos < pos - below:
+            above = self._offsets[i + 1]
+            line = self._lines[i + 1] - self._text.count(self._newline, pos, above)
+        else:
+            line = self._lines[i] + self._text.count(self._newline, below, pos)
+        self._offsets.insert(i + 1, pos)
+        self._lines.insert(i + 1, line)
+        return line
+
+def _literal_match_contexts(content: str, literal: str, pattern: Pattern[str],
+                            literal_only: bool, around_lines: int):
+    """
+    Same as _line_match_contexts, but only visits lines containing literal.
+
+    Line bounds and context come from newline offsets around each occurrence,
+    so content is never split as a whole. content must be ASCII.
+    """
+    lowered = content.lower()
+    line_index = counted_to = 0
+    pos = lowered.find(literal)
+    while pos != -1:
+        line_start, line_end = _line_bounds(content, pos)
+
+        if literal_only or pattern.search(content[line_start:line_end]):
+            line_index += content.count('\n', counted_to, line_start)
+            counted_to = line_start
+
+            context_start, context_end, before = _context_bounds(
+                content, line_start, line_end, around_lines
+            )
+            yield line_index, line_index - before, content[context_start:context_end].split('\n')
+
+        pos = lowered.find(literal, line_end + 1)
+
+# Bytes pulled from an S3 response stream per read
+_READ_BLOCK = 1 << 20
+
+def _read_log(body, compressed: bool, max_bytes: int,
+              ascii_bytes: bool = False) -> Union[str, bytes, None]:
+    """
+    Read, decompress and decode a log object's response stream.
+
+    Returns None as soon as more than max_bytes of (decompressed) data come
+    out, without reading the rest. With ascii_bytes, an all-ASCII log is
+    returned as bytes instead of being decoded.
+    """
+    raw = _gzip.GzipFile(fileobj=body) if compressed else body
+    blocks, total = [], 0
+    try:
+        while True:
+            block = raw.read(_READ_BLOCK)
+            if not block:
+                break
+            total += len(block)
+            if total > max_bytes:
+                return None
+            blocks.append(block)
+    finally:
+        body.close()
+
+    data = b''.join(blocks)
+    if ascii_bytes and data.isascii():
+        if b'\r' in data:
+            data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        return data
+
+    text = data.decode('utf-8')
+    # Same newline translation as the text-mode file reads this replaced
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+class _PatternSearch:
+    """One set of error patterns, filled file by file up to a per-category cap."""
+
+    __slots__ = ('error_patterns', 'max_per_category', 'found_errors', 'done')
+
+    def __init__(self, error_patterns: Dict[str, List[Union[str, Pattern[str]]]],
+                 max_per_category: int):
+        self.error_patterns = error_patterns
+        self.max_per_category = max_per_category
+        self.found_errors = {category: [] for category in error_patterns}
+        self.done = False
+
+    def merge(self, file_errors: Dict[str, List[Dict]]) -> List[Tuple[str, Dict]]:
+        """Add one file's errors up to the cap; returns the (category, error) pairs kept."""
+        kept = []
+        for category, errors in file_errors.items():
+            found = self.found_errors[category]
+            # Anything past the limit is dropped
+            room = self.max_per_category - len(found)
+            if room > 0:
+                found.extend(errors[:room])
+                kept.extend((category, error) for error in errors[:room])
+
+        # Every category is full, so the remaining files can't change the result
+        if all(len(errors) >= self.max_per_category for errors in self.found_errors.values()):
+            self.done = True
+        return kept
+
 class S3LogClient:
+    # Enough pooled connections for concurrent downloads across overlapping tool
+    # calls: search read-ahead runs up to 16 downloads, one get_object apiece,
+    # so two searches can overlap alongside a tool's smaller fan-out
+    MAX_POOL_CONNECTIONS = 32
+    # Cap on a .gz log's decompressed size, as a multiple of max_size_mb;
+    # text logs rarely compress past 10x, so beyond that is likely not a log
+    MAX_DECOMPRESSED_RATIO = 10
+    # Adaptive mode also backs off client-side when S3 starts throttling the fan-out
+    RETRY_CONFIG = {'mode': 'adaptive', 'max_attempts': 5}
+    # Log files downloaded ahead of the one being searched in search_error_patterns,
+    # and the most bytes those may hold once read, with a .gz charged at
+    # MAX_DECOMPRESSED_RATIO times its listed size. Clusters have many tiny
+    # executor logs, where per-request latency dominates, so the count is high
+    # and large files are bounded by the byte budget instead.
+    MAX_CONCURRENT_DOWNLOADS = 16
+    READ_AHEAD_BYTES = 64 * 1024 * 1024
+    # Seconds a cluster's log listing is reused; the agent usually runs several
+    # tools against the same cluster in quick succession
+    LISTING_TTL_SECONDS = 60
+
     def __init__(self):
         self.session = boto3.Session(
             aws_access_key_id=config.aws_access_key_id,
             aws_secret_access_key=config.aws_secret_access_key,
             region_name=config.aws_region
         )
-        self.s3_client = self.session.client('s3')
+        self.s3_client = self.session.client(
+            's3', config=BotoConfig(max_pool_connections=self.MAX_POOL_CONNECTIONS,
+                                    retries=self.RETRY_CONFIG,
+                                    tcp_keepalive=True)
+        )
         self.bucket = config.databricks_logs_bucket
         self.prefix = config.databricks_logs_prefix
+        # cluster_id -> (time.monotonic() when listed, log files)
+        self._listing_cache: Dict[str, Tuple[float, List[LogFile]]] = {}
 
     def build_log_path(self, cluster_id: str) -> str:
         return f"{self.prefix}/{cluster_id}"
 
-    async def list_cluster_logs(self, cluster_id: str) -> List[Dict[str, str]]:
+    async def list_cluster_logs(self, cluster_id: str) -> List[LogFile]:
+        now = time.monotonic()
+        cached = self._listing_cache.get(cluster_id)
+        if cached is not None and now - cached[0] < self.LISTING_TTL_SECONDS:
+            return list(cached[1])
+
         log_path = self.build_log_path(cluster_id)
 
         try:
-            paginator = self.s3_client.get_paginator('list_objects_v2')
-            pages = paginator.paginate(Bucket=self.bucket, Prefix=log_path)
-
-            log_files = []
-            for page in pages:
-                if 'Contents' in page:
-                    for obj in page['Contents']:
-                        key = obj['Key']
-                        file_name = os.path.basename(key)
-                        log_files.append({
-                            'key': key,
-                            'file_name': file_name,
-                            'size': obj['Size'],
-                            'last_modified': obj['LastModified'].isoformat(),
-                            'log_type': self._classify_log_type(file_name)
-                        })
-
-            return sorted(log_files, key=lambda x: x['last_modified'], reverse=True)
-
+            # Each page is a blocking request, so paginate on a worker thread
+            log_files = await asyncio.to_thread(self._list_log_files, log_path)
         except ClientError as e:
             raise Exception(f"Failed to list logs for cluster {cluster_id}: {str(e)}")
 
+        # Drop expired listings so the cache doesn't grow with every cluster seen
+        self._listing_cache = {
+            key: entry for key, entry in self._listing_cache.items()
+            if now - entry[0] < self.LISTING_TTL_SECONDS
+        }
+        self._listing_cache[cluster_id] = (now, log_files)
+        return list(log_files)
+
+    def _list_log_files(self, log_path: str) -> List[LogFile]:
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=self.bucket, Prefix=log_path)
+
+        log_files = []
+        for page in pages:
+            if 'Contents' in page:
+                for obj in page['Contents']:
+                    key = obj['Key']
+                    file_name = os.path.basename(key)
+                    log_files.append(LogFile(
+                        key=key,
+                        file_name=file_name,
+                        size=obj['Size'],
+                        last_modified=obj['LastModified'].isoformat(),
+                        log_type=self._classify_log_type(file_name)
+                    ))
+
+        return sorted(log_files, key=lambda x: x.last_modified, reverse=True)
+
     def _classify_log_type(self, file_name: str) -> str:
-        file_name = file_name.lower()
-        if 'stderr' in file_name:
-            return 'stderr'
-        elif 'stdout' in file_name:
-            return 'stdout'
-        elif 'log4j' in file_name:
-            return 'log4j'
-        elif 'driver' in file_name:
-            return 'driver'
-        elif 'executor' in file_name:
-            return 'executor'
-        elif file_name.endswith('.gz'):
+        log_type = log_type_for(file_name)
+        if log_type == 'unknown' and file_name.lower().endswith('.gz'):
             return 'compressed'
-        else:
-            return 'unknown'
+        return log_type
 
-    async def download_and_read_log(self, s3_key: str, max_size_mb: int = 50) -> str:
+    async def download_and_read_log(self, s3_key: str, max_size_mb: int = 50,
+                                    ascii_bytes: bool = False) -> Union[str, bytes]:
+        # ascii_bytes lets byte-level scanners skip decoding ASCII logs, which
+        # are read identically as bytes; anything else is still decoded
         try:
-            # Get object metadata to check size
-            response = self.s3_client.head_object(Bucket=self.bucket, Key=s3_key)
+            # boto3 is blocking; run its calls in a worker thread so that
+            # concurrent downloads actually overlap on the network.
+            # get_object's headers carry the size, so no separate HEAD is needed
+            # for the check; the body is only read once it passes.
+            response = await asyncio.to_thread(
+                self.s3_client.get_object, Bucket=self.bucket, Key=s3_key
+            )
             file_size = response['ContentLength']
 
             if file_size > max_size_mb * 1024 * 1024:
+                response['Body'].close()
                 raise Exception(f"Log file {s3_key} is too large ({file_size / (1024*1024):.1f}MB). "
                               f"Maximum allowed: {max_size_mb}MB")
 
-            # Download the file
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                self.s3_client.download_fileobj(self.bucket, s3_key, temp_file)
-                temp_file_path = temp_file.name
-
-            try:
-                # Read the file content
-                if s3_key.endswith('.gz'):
-                    with gzip.open(temp_file_path, 'rt', encoding='utf-8') as f:
-                        content = f.read()
-                else:
-                    async with aiofiles.open(temp_file_path, 'r', encoding='utf-8') as f:
-                        content = await f.read()
-
-                return content
-            finally:
-                os.unlink(temp_file_path)
+            # Decompress straight off the response stream, so the compressed
+            # object is never buffered whole. Reading and decoding a large log
+            # takes long enough to stall the event loop, so it runs on the
+            # worker thread too.
+            compressed = s3_key.endswith('.gz')
+            max_mb = max_size_mb * self.MAX_DECOMPRESSED_RATIO if compressed else max_size_mb
+            content = await asyncio.to_thread(
+                _read_log, response['Body'], compressed, max_mb * 1024 * 1024, ascii_bytes
+            )
+            if content is None:
+                raise Exception(f"Log file {s3_key} is too large once decompressed. "
+                              f"Maximum allowed: {max_mb}MB")
+            return content
 
         except ClientError as e:
             raise Exception(f"Failed to download log {s3_key}: {str(e)}")
         except UnicodeDecodeError:
             raise Exception(f"Failed to decode log file {s3_key}. File may be binary or corrupted.")
 
-    async def get_log_snippet(self, s3_key: str, search_pattern: str = None,
+    async def get_log_snippet(self, s3_key: str,
+                            search_pattern: Union[str, Pattern[str]] = None,
                             max_lines: int = 100, around_lines: int = 5) -> str:
         try:
             content = await self.download_and_read_log(s3_key, max_size_mb=10)
-            lines = content.split('\n')
 
             if search_pattern:
-                pattern = re.compile(search_pattern, re.IGNORECASE)
+                # Callers scanning many files pass a pre-compiled pattern
+                if isinstance(search_pattern, str):
+                    pattern = re.compile(search_pattern, re.IGNORECASE)
+                else:
+                    pattern = search_pattern
                 matching_lines = []
 
-                for i, line in enumerate(lines):
-                    if pattern.search(line):
-                        start = max(0, i - around_lines)
-                        end = min(len(lines), i + around_lines + 1)
-
-                        context_lines = []
-                        for j in range(start, end):
-                            prefix = ">>>" if j == i else "   "
-                            context_lines.append(f"{prefix} {j+1:4d}: {lines[j]}")
+                # Jump between occurrences of the pattern's required literal instead
+                # of splitting the whole file. Lowercasing keeps offsets intact only
+                # for ASCII, so other content takes the line-by-line scan.
+                literal, literal_only = required_literal(pattern)
+                if literal and '\n' not in literal and content.isascii():
+                    contexts = _literal_match_contexts(
+                        content, literal, pattern, literal_only, around_lines
+                    )
+                else:
+                    contexts = _line_match_contexts(content, pattern, around_lines)
 
-                        matching_lines.extend(context_lines)
-                        matching_lines.append("---")
+                for i, first, context in contexts:
+                    for j, line in enumerate(context, first):
+                        prefix = ">>>" if j == i else "   "
+                        matching_lines.append(f"{prefix} {j+1:4d}: {line}")
+                    matching_lines.append("---")
 
-                        if len(matching_lines) > max_lines * 2:
-                            break
+                    if len(matching_lines) > max_lines * 2:
+                        break
 
                 return '\n'.join(matching_lines[:max_lines * 2])
             else:
-                return '\n'.join([f"{i+1:4d}: {line}" for i, line in enumerate(lines[:max_lines])])
+                lines = content.split('\n', max_lines)[:max_lines]
+                return '\n'.join([f"{i+1:4d}: {line}" for i, line in enumerate(lines)])
 
         except Exception as e:
             return f"Error reading log snippet: {str(e)}"
 
     async def search_error_patterns(self, cluster_id: str,
-                                   custom_patterns: Dict[str, List[str]] = None,
+                                   custom_patterns: Dict[str, List[Union[str, Pattern[str]]]] = None,
                                    max_errors_per_category: int = 50) -> Dict[str, List[str]]:
         """
         Enhanced error pattern search with comprehensive regex patterns.
         """
-        log_files = await self.list_cluster_logs(cluster_id)
-
-        # Enhanced comprehensive error patterns
-        default_patterns = {
-            'critical_errors': [
-                r'(?i)\bfatal\s+error\b',
-                r'(?i)\bcritical\s+error\b',
-                r'(?i)\boutofmemoryerror\b',
-                r'(?i)\bsegmentation\s+fault\b',
-                r'(?i)\bcore\s+dumped\b',
-                r'(?i)\bpanic\b.*\berror\b',
-                r'(?i)\bcrash\b.*\berror\b'
-            ],
-            'spark_errors': [
-                r'(?i)\banalysisexception\b',
-                r'(?i)\bsparkexception\b',
-                r'(?i)org\.apache\.spark\..*exception',
-                r'(?i)\bjob\s+\d+\s+failed\b',
-                r'(?i)\bstage\s+\d+\s+failed\b',
-                r'(?i)\btask\s+failed\b',
-                r'(?i)\bexecutor\s+lost\b',
-                r'(?i)\bdriver\s+stacktrace\b',
-                r'(?i)\bshuffle\s+fetch\s+failed\b'
-            ],
-            'memory_issues': [
-                r'(?i)\boutofmemoryerror\b',
-                r'(?i)java\.lang\.outofmemoryerror',
-                r'(?i)\bcontainer\s+killed.*memory\b',
-                r'(?i)\bgc\s+overhead\s+limit\b',
-                r'(?i)\bheap\s+space\s+exhausted\b',
-                r'(?i)\bmetaspace\s+out\s+of\s+memory\b',
-                r'(?i)\bdirect\s+buffer\s+memory\b'
-            ],
-            'io_errors': [
-                r'(?i)\bfilenotfoundexception\b',
-                r'(?i)\bioexception\b',
-                r'(?i)\bno\s+such\s+file\s+or\s+directory\b',
-                r'(?i)\bpermission\s+denied\b',
-                r'(?i)\baccess\s+denied\b',
-                r'(?i)\bdisk\s+space\s+exhausted\b',
-                r'(?i)\bno\s+space\s+left\s+on\s+device\b',
-                r'(?i)\bread\s+timed\s+out\b'
-            ],
-            'network_errors': [
-                r'(?i)\bconnection\s+refused\b',
-                r'(?i)\bconnection\s+timeout\b',
-                r'(?i)\bconnection\s+reset\b',
-                r'(?i)\bunknownhostexception\b',
-                r'(?i)\bsockettimeoutexception\b',
-                r'(?i)\bnetwork\s+is\s+unreachable\b',
-                r'(?i)\bhost\s+is\s+unreachable\b',
-                r'(?i)\bbroken\s+pipe\b'
-            ],
-            'application_errors': [
-                r'(?i)\bnullpointerexception\b',
-                r'(?i)\bclassnotfoundexception\b',
-                r'(?i)\bclasscastexception\b',
-                r'(?i)\bnumberformatexception\b',
-                r'(?i)\billegalargumentexception\b',
-                r'(?i)\billegalstateexception\b',
-                r'(?i)\bunsupportedoperationexception\b',
-                r'(?i)\bruntimeexception\b'
-            ],
-            'authentication_errors': [
-                r'(?i)\bauthentication\s+failed\b',
-                r'(?i)\bauthorization\s+failed\b',
-                r'(?i)\baccess\s+token\s+expired\b',
-                r'(?i)\binvalid\s+credentials\b',
-                r'(?i)\bunauthorized\s+access\b',
-                r'(?i)\bforbidden\s+access\b',
-                r'(?i)\bssl\s+certificate\s+error\b'
-            ],
-            'configuration_errors': [
-                r'(?i)\bconfiguration\s+error\b',
-                r'(?i)\binvalid\s+configuration\b',
-                r'(?i)\bmissing\s+configuration\b',
-                r'(?i)\bproperty\s+not\s+found\b',
-                r'(?i)\benvironment\s+variable\s+not\s+set\b',
-                r'(?i)\bclasspath\s+error\b',
-                r'(?i)\blibrary\s+not\s+found\b'
-            ]
-        }
-
         # Use custom patterns if provided, otherwise use defaults
-        error_patterns = custom_patterns if custom_patterns else default_patterns
+        error_patterns = custom_patterns if custom_patterns else _DEFAULT_ERROR_PATTERNS
         found_errors = {category: [] for category in error_patterns}
 
-        # Priority order for log files (most likely to contain errors first)
-        priority_order = ['stderr', 'log4j', 'driver', 'executor', 'stdout', 'unknown']
-        sorted_log_files = sorted(log_files,
-                                key=lambda x: priority_order.index(x['log_type'])
-                                if x['log_type'] in priority_order else 99)
+        async for category, error in self.iter_error_matches(
+            cluster_id, error_patterns, max_errors_per_category
+        ):
+            found_errors[category].append(error)
 
-        for log_file in sorted_log_files:
-            try:
-                content = await self.download_and_read_log(log_file['key'], max_size_mb=25)
+        return found_errors
 
-                # Search for patterns in this file
-                file_errors = await self._search_patterns_in_content(
-                    content, error_patterns, log_file, max_errors_per_category
-                )
+    async def iter_error_matches(self, cluster_id: str,
+                                 custom_patterns: Dict[str, List[Union[str, Pattern[str]]]] = None,
+                                 max_errors_per_category: int = 50
+                                 ) -> AsyncGenerator[Tuple[str, Dict], None]:
+        """
+        Yield (category, error) as search_error_patterns finds them, file by file.
 
-                # Merge results
-                for category, errors in file_errors.items():
-                    found_errors[category].extend(errors)
+        Callers that need only the first few errors can stop early; closing the
+        generator (aclose) cancels any downloads still in flight.
+        """
+        log_files = await self.list_cluster_logs(cluster_id)
 
-                    # Trim if exceeded limit
-                    if len(found_errors[category]) > max_errors_per_category:
-                        found_errors[category] = found_errors[category][:max_errors_per_category]
+        error_patterns = custom_patterns if custom_patterns else _DEFAULT_ERROR_PATTERNS
+        search = _PatternSearch(error_patterns, max_errors_per_category)
+        async for _, category, error in self._run_pattern_searches(log_files, [search]):
+            yield category, error
 
-            except Exception as e:
-                print(f"Error searching in {log_file['key']}: {str(e)}")
-                continue
+    async def _run_pattern_searches(self, log_files: List[LogFile],
+                                    searches: List['_PatternSearch'],
+                                    after_file: Optional[Callable[[], None]] = None
+                                    ) -> AsyncGenerator[Tuple['_PatternSearch', str, Dict], None]:
+        """
+        Feed each log file, downloaded once, to every search not yet done,
+        yielding (search, category, error) for each error a search keeps.
 
-        return found_errors
+        Files go in priority order. after_file runs once each file has been
+        searched and may mark searches done; downloads stop once all are.
+        """
+        sorted_log_files = sorted(log_files,
+                                key=lambda x: _LOG_TYPE_PRIORITY.get(x.log_type, 99))
+
+        downloads = self._read_logs_ahead(sorted_log_files, max_size_mb=25)
+        try:
+            async for log_file, content in downloads:
+                if isinstance(content, Exception):
+                    print(f"Error searching in {log_file.key}: {str(content)}")
+                    continue
+
+                for search in searches:
+                    if search.done:
+                        continue
+                    try:
+                        # Search for patterns in this file
+                        file_errors = await self._search_patterns_in_content(
+                            content, search.error_patterns, log_file, search.max_per_category
+                        )
+                    except Exception as e:
+                        print(f"Error searching in {log_file.key}: {str(e)}")
+                        continue
+                    for category, error in search.merge(file_errors):
+                        yield search, category, error
+
+                if after_file is not None:
+                    after_file()
+                if all(search.done for search in searches):
+                    break
+        finally:
+            # Cancels any downloads still in flight after an early stop
+            await downloads.aclose()
+
+    async def _read_logs_ahead(self, log_files: List[LogFile], max_size_mb: int
+                               ) -> AsyncGenerator[tuple, None]:
+        """
+        Yield (log_file, content) in the given order while later files download.
 
-    async def _search_patterns_in_content(self, content: str,
-                                        error_patterns: Dict[str, List[str]],
-                                        log_file: Dict,
+        Up to MAX_CONCURRENT_DOWNLOADS files, and READ_AHEAD_BYTES of content, are
+        fetched ahead of the one being yielded, so memory stays bounded. Read-ahead
+        starts only after the first file, which often fills every category by
+        itself. A failed download is yielded as its exception.
+        """
+        next_index = 0
+        pending = deque()
+        pending_bytes = 0
+        max_bytes = max_size_mb * 1024 * 1024
+
+        def fill(limit: int):
+            nonlocal next_index, pending_bytes
+            while next_index < len(log_files) and len(pending) < limit:
+                log_file = log_files[next_index]
+                # A .gz may inflate up to MAX_DECOMPRESSED_RATIO times its listed size
+                if log_file.key.endswith('.gz'):
+                    cost = min(log_file.size, max_bytes) * self.MAX_DECOMPRESSED_RATIO
+                else:
+                    cost = log_file.size
+                # One download is always allowed, however large
+                if pending and pending_bytes + cost > self.READ_AHEAD_BYTES:
+                    break
+                next_index += 1
+                pending_bytes += cost
+                pending.append((log_file, cost, asyncio.ensure_future(
+                    self.download_and_read_log(log_file.key, max_size_mb=max_size_mb,
+                                               ascii_bytes=True)
+                )))
+
+        fill(1)
+        first = True
+        try:
+            while pending:
+                log_file, cost, task = pending.popleft()
+                pending_bytes -= cost
+                try:
+                    content = await task
+                except Exception as e:
+                    content = e
+
+                if first:
+                    yield log_file, content
+                    fill(self.MAX_CONCURRENT_DOWNLOADS)
+                    first = False
+                else:
+                    # Refill before yielding so the next downloads overlap the search
+                    fill(self.MAX_CONCURRENT_DOWNLOADS)
+                    yield log_file, content
+        finally:
+            for _, _, task in pending:
+                task.cancel()
+
+    async def _search_patterns_in_content(self, content: Union[str, bytes],
+                                        error_patterns: Dict[str, List[Union[str, Pattern[str]]]],
+                                        log_file: LogFile,
                                         max_per_category: int) -> Dict[str, List[Dict]]:
         """
         Search for error patterns within log content with enhanced context extraction.
+
+        content is either decoded text or an ASCII log left as bytes. Match and
+        line offsets are taken in bytes then, which equal character offsets
+        only because every ASCII character is one byte.
         """
+        # Scanning a large log is pure regex work; on a worker thread it keeps the
+        # event loop free, so the next file's download overlaps this scan
+        return await asyncio.to_thread(self._search_patterns_in_content_sync,
+                                       content, error_patterns, log_file, max_per_category)
+
+    def _search_patterns_in_content_sync(self, content: Union[str, bytes],
+                                         error_patterns: Dict[str, List[Union[str, Pattern[str]]]],
+                                         log_file: LogFile,
+                                         max_per_category: int) -> Dict[str, List[Dict]]:
         file_errors = {category: [] for category in error_patterns}
-        lines = content.split('\n')
+        # Built on first use: most patterns find nothing in most files
+        line_numbers = None
+        # Patterns whose required literal is missing from the file can't match;
+        # lower() only agrees with IGNORECASE on ASCII, so other files scan fully
+        if isinstance(content, bytes):
+            # An ASCII log left undecoded; only the slices kept are decoded
+            lowered, data = content.lower(), content
+            text = bytes.decode
+        else:
+            lowered = content.lower() if content.isascii() else None
+            data = content.encode() if lowered is not None else None
+            text = str
 
         for category, patterns in error_patterns.items():
             for pattern in patterns:
                 try:
-                    matches = list(re.finditer(pattern, content, re.IGNORECASE | re.MULTILINE))
-
-                    for match in matches:
+                    # Patterns may arrive pre-compiled from module-level constants
+                    if isinstance(pattern, str):
+                        compiled = _compile_pattern(pattern)
+                    else:
+                        compiled = pattern
+
+                    literal = required_literal(compiled)[0]
+                    if literal is not None and data is content:
+                        literal = literal.encode()
+                    if lowered is not None and literal is not None and literal not in lowered:
+                        continue
+
+                    for match_start, match_end in _match_spans(content, lowered, data, compiled):
                         if len(file_errors[category]) >= max_per_category:
                             break
 
+                        if line_numbers is None:
+                            line_numbers = _LineNumbers(content)
+
                         # Find the line containing the match
-                        line_start = content.rfind('\n', 0, match.start()) + 1
-                        line_end = content.find('\n', match.end())
+                        line_num = line_numbers.line_of(match_start)
+                        line_start, first_line_end = _line_bounds(content, match_start)
+                        line_end = content.find(_newline(content), match_end)
                         if line_end == -1:
                             line_end = len(content)
 
-                        error_line = content[line_start:line_end].strip()
+                        error_line = text(content[line_start:line_end]).strip()
 
-                        # Get surrounding context (2 lines before and after)
-                        line_num = content[:match.start()].count('\n')
-                        context_start = max(0, line_num - 2)
-                        context_end = min(len(lines), line_num + 3)
-                        context_lines = lines[context_start:context_end]
+                        # Get surrounding context (2 lines before and after),
+                        # sliced straight from the content
+                        context_start, context_end, _ = _context_bounds(
+                            content, line_start, first_line_end, 2
+                        )
 
                         # Extract timestamp if present
-                        timestamp_match = re.search(
-                            r'\d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2}',
-                            error_line
-                        )
+                        timestamp_match = _TIMESTAMP.search(error_line)
                         timestamp = timestamp_match.group() if timestamp_match else None
 
                         file_errors[category].append({
-                            'file': log_file['file_name'],
-                            'file_type': log_file['log_type'],
-                            'pattern': pattern,
-                            'matched_text': match.group(),
+                            'file': log_file.file_name,
+                            'file_type': log_file.log_type,
+                            'pattern': compiled.pattern,
+                            'matched_text': text(content[match_start:match_end]),
                             'line': error_line,
                             'line_number': line_num + 1,
-                            'context': '\n'.join(context_lines),
+                            'context': text(content[context_start:context_end]),
                             'timestamp': timestamp,
-                            'position': match.start(),
+                            'position': match_start,
                             'severity': self._classify_error_severity(error_line, category)
                         })
 
@@ -375,14 +785,29 @@ class S3LogClient:
             {}
         ]
 
-        for iteration in range(min(max_iterations, len(pattern_levels))):
-            patterns = pattern_levels[iteration] if iteration < len(pattern_levels) else None
+        # Every level searches the same files, so all levels share one download
+        # of each file instead of each level re-fetching the whole cluster
+        searches = [
+            _PatternSearch(pattern_levels[iteration] or _DEFAULT_ERROR_PATTERNS,
+                           20 if iteration == 0 else 50)
+            for iteration in range(min(max_iterations, len(pattern_levels)))
+        ]
 
-            results = await self.search_error_patterns(
-                cluster_id,
-                custom_patterns=patterns,
-                max_errors_per_category=20 if iteration == 0 else 50
-            )
+        def skip_deeper_levels():
+            # Critical errors end the search after level 1, so deeper levels'
+            # results would be discarded; stop computing them
+            if searches[0].found_errors.get('critical_errors'):
+                for search in searches[1:]:
+                    search.done = True
+
+        if searches:
+            log_files = await self.list_cluster_logs(cluster_id)
+            async for _ in self._run_pattern_searches(log_files, searches, skip_deeper_levels):
+                pass
+
+        for iteration, search in enumerate(searches):
+            patterns = pattern_levels[iteration]
+            results = search.found_errors
 
             iteration_results.append({
                 'iteration': iteration + 1,
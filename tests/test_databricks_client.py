@@ -0,0 +1,64 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from src.utils.databricks_client import DatabricksClient
+
+def _job(job_id, name):
+    return SimpleNamespace(job_id=job_id, settings=SimpleNamespace(name=name),
+                           created_time=0, creator_user_name='user')
+
+@pytest.fixture
+def databricks_client():
+    with patch('src.utils.databricks_client.WorkspaceClient') as mock_workspace:
+        mock_workspace.return_value.jobs.list.return_value = [
+            _job(1, 'daily_etl'),
+            _job(2, 'ml_training')
+        ]
+        yield DatabricksClient()
+
+@pytest.mark.asyncio
+async def test_search_jobs_by_name(databricks_client):
+    result = await databricks_client.search_jobs_by_name('etl')
+
+    assert [job['job_id'] for job in result] == [1]
+    assert result[0]['job_name'] == 'daily_etl'
+
+@pytest.mark.asyncio
+async def test_search_jobs_by_name_literal_and_regex_agree(databricks_client):
+    literal = await databricks_client.search_jobs_by_name('ETL')
+    regex = await databricks_client.search_jobs_by_name('^daily_e.l$')
+
+    assert [job['job_id'] for job in literal] == [1]
+    assert [job['job_id'] for job in regex] == [1]
+
+@pytest.mark.asyncio
+async def test_job_listing_is_reused_across_searches(databricks_client):
+    await databricks_client.search_jobs_by_name('etl')
+    await databricks_client.search_jobs_by_name('ml')
+
+    assert databricks_client.client.jobs.list.call_count == 1
+
+def _run(run_id, cluster_id=None, task_cluster_ids=()):
+    def _instance(cid):
+        return SimpleNamespace(cluster_id=cid) if cid else None
+
+    return SimpleNamespace(
+        run_id=run_id, job_id=1, run_name=f'run-{run_id}',
+        cluster_instance=_instance(cluster_id),
+        tasks=[SimpleNamespace(cluster_instance=_instance(cid)) for cid in task_cluster_ids],
+        state=None, start_time=None, end_time=None,
+        execution_duration=None, creator_user_name='user'
+    )
+
+@pytest.mark.asyncio
+async def test_get_cluster_ids_for_job_uses_inline_tasks(databricks_client):
+    databricks_client.client.jobs.list_runs.return_value = [
+        _run(10, cluster_id='cluster-a'),
+        _run(11, task_cluster_ids=('cluster-b', 'cluster-c'))
+    ]
+
+    result = await databricks_client.get_cluster_ids_for_job('etl')
+
+    assert sorted(result) == ['cluster-a', 'cluster-b', 'cluster-c']
+    assert databricks_client.client.jobs.list_runs.call_args.kwargs['expand_tasks'] is True
+    databricks_client.client.jobs.get_run.assert_not_called()
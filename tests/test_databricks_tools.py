@@ -0,0 +1,38 @@
+import asyncio
+import orjson
+import pytest
+from unittest.mock import MagicMock, patch
+from src.tools import databricks_tools
+from src.utils.s3_client import LogFile
+
+@pytest.mark.asyncio
+async def test_analyze_cluster_logs_streams_files_in_priority_order():
+    log_files = [
+        LogFile(key=f'databrickslogs/cluster-123/executor/stderr.{i}', file_name=f'stderr.{i}',
+                size=1024 - i, last_modified='2024-01-01T00:00:00+00:00', log_type='stderr')
+        for i in range(4)
+    ]
+    s3_client = MagicMock()
+
+    async def list_cluster_logs(cluster_id):
+        return log_files
+
+    async def download(key, **kwargs):
+        # The highest-priority file arrives last
+        if key.endswith('stderr.0'):
+            await asyncio.sleep(0.05)
+        return "ERROR java.lang.OutOfMemoryError: Java heap space\n"
+
+    s3_client.list_cluster_logs.side_effect = list_cluster_logs
+    s3_client.download_and_read_log.side_effect = download
+
+    with patch.object(databricks_tools, '_get_s3_client', return_value=s3_client):
+        result = orjson.loads(await databricks_tools.analyze_cluster_logs('cluster-123'))
+
+    chunks = result['analysis']['prioritized_chunks']
+    assert [(c['chunk_id'], c['file_name']) for c in chunks] == [
+        (i, f'stderr.{i}') for i in range(4)
+    ]
+    memory_errors = next(e for e in result['analysis']['error_summary']
+                         if e['error_type'] == 'memory_errors')
+    assert memory_errors['relevant_logs'] == ['stderr.0', 'stderr.1', 'stderr.2']
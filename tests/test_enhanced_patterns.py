@@ -2,7 +2,7 @@ import pytest
 import asyncio
 from unittest.mock import Mock, patch, AsyncMock
 from src.utils.log_analyzer import LogAnalyzer
-from src.utils.s3_client import S3LogClient
+from src.utils.s3_client import LogFile, S3LogClient
 
 class TestEnhancedErrorPatterns:
     """Test enhanced error pattern detection capabilities."""
@@ -120,7 +120,7 @@ class TestEnhancedErrorPatterns:
                 }]
             }
 
-            log_file = {'file_name': 'stderr', 'log_type': 'stderr'}
+            log_file = LogFile('driver/stderr', 'stderr', 0, '', 'stderr')
             result = await s3_client._search_patterns_in_content(
                 mock_content,
                 {'memory_issues': [r'(?i)\\boutofmemoryerror\\b']},
@@ -138,23 +138,24 @@ class TestEnhancedErrorPatterns:
     async def test_iterative_early_termination(self, s3_client):
         """Test that iterative search terminates early when critical errors are found."""
 
-        # Mock search results with critical errors in first iteration
-        with patch.object(s3_client, 'search_error_patterns') as mock_search:
-            mock_search.return_value = {
-                'critical_errors': [
-                    {
-                        'file': 'stderr',
-                        'line': 'FATAL ERROR: System crash',
-                        'severity': 'critical'
-                    }
-                ]
-            }
+        # Log with critical errors found by the first iteration
+        mock_log_files = [
+            LogFile(key='databrickslogs/test-cluster/driver/stderr', file_name='stderr',
+                    size=1024, last_modified='2024-01-01T00:00:00+00:00', log_type='stderr')
+        ]
+
+        with patch.object(s3_client, 'list_cluster_logs', return_value=mock_log_files):
+            with patch.object(s3_client, 'download_and_read_log',
+                              return_value="FATAL ERROR: System crash") as mock_download:
+                result = await s3_client.search_iterative_patterns('test-cluster', max_iterations=3)
 
-            result = await s3_client.search_iterative_patterns('test-cluster', max_iterations=3)
+                # Should terminate early due to critical errors
+                assert len(result['iteration_summary']) == 1
+                assert result['iteration_summary'][0]['iteration'] == 1
+                assert result['errors_by_category']['critical_errors'][0]['line'] == 'FATAL ERROR: System crash'
 
-            # Should terminate early due to critical errors
-            assert len(result['iteration_summary']) == 1
-            assert result['iteration_summary'][0]['iteration'] == 1
+                # All levels share a single download of each file
+                assert mock_download.call_count == 1
 
     @pytest.mark.asyncio
     async def test_severity_classification(self, s3_client):
@@ -203,7 +204,7 @@ class TestEnhancedErrorPatterns:
             ]
         }
 
-        log_file = {'file_name': 'test.log', 'log_type': 'stderr'}
+        log_file = LogFile('driver/test.log', 'test.log', 0, '', 'stderr')
         content = "Some log content with valid pattern"
 
         # Should not crash with invalid regex
@@ -0,0 +1,118 @@
+import re
+import pytest
+from src.utils.log_analyzer import LogAnalyzer, _iter_chunks
+
+@pytest.fixture
+def log_analyzer():
+    return LogAnalyzer()
+
+async def _as_stream(log_content):
+    for file_name, content in log_content.items():
+        yield file_name, content
+
+@pytest.mark.asyncio
+async def test_streaming_analysis_matches_batch(log_analyzer):
+    log_content = {
+        "stderr": "2024-01-01 10:01:00 ERROR java.lang.OutOfMemoryError: Java heap space",
+        "stdout": "2024-01-01 10:01:30 ERROR java.lang.OutOfMemoryError: Java heap space",
+        "driver.log": "2024-01-01 10:02:00 ERROR java.lang.OutOfMemoryError: GC overhead limit exceeded",
+        "log4j-active.log": "2024-01-01 10:03:00 ERROR Connection refused: unable to connect"
+    }
+
+    batch = await log_analyzer.analyze_logs(log_content)
+    streamed = await log_analyzer.analyze_logs_streaming(_as_stream(log_content))
+
+    batch_errors = [(e.error_type, e.frequency, e.relevant_logs) for e in batch['error_summary']]
+    streamed_errors = [(e.error_type, e.frequency, e.relevant_logs) for e in streamed['error_summary']]
+    assert streamed_errors == batch_errors
+    assert ('memory_errors', 3, ['driver.log', 'stderr', 'stdout']) in streamed_errors
+
+    assert ([(c.chunk_id, c.content) for c in streamed['prioritized_chunks']] ==
+            [(c.chunk_id, c.content) for c in batch['prioritized_chunks']])
+
+@pytest.mark.asyncio
+async def test_streaming_analysis_keeps_top_chunks_only(log_analyzer):
+    log_content = {f"stderr-{i}": f"ERROR OutOfMemoryError number {i}" for i in range(5)}
+
+    streamed = await log_analyzer.analyze_logs_streaming(_as_stream(log_content), max_chunks=2)
+
+    assert len(streamed['prioritized_chunks']) == 2
+
+def test_error_indicators_match_unfiltered_regex(log_analyzer):
+    contents = [
+        "2024-01-01 10:00:00 INFO BlockManager: stored block rdd_1 in memory",
+        "2024-01-01 10:01:00 ERROR Java.Lang.OutOfMemoryError: Java heap space",
+        "2024-01-01 10:02:00 ERROR Connection REFUSED by Hōst",
+        "2024-01-01 10:03:00 WARN Table or view not found: sales"
+    ]
+
+    for content in contents:
+        expected = [error_type for error_type, config in log_analyzer.error_patterns.items()
+                    if any(re.search(pattern, content, re.IGNORECASE)
+                           for pattern in config['patterns'])]
+        assert log_analyzer._score_chunk(content, 'unknown')[1] == expected
+
+@pytest.mark.asyncio
+async def test_iterative_analysis_orders_errors_by_severity(log_analyzer):
+    log_content = {
+        "stderr": "\n".join([
+            "2024-01-01 10:01:00 ERROR Table or view not found: sales",
+            "2024-01-01 10:01:01 ERROR Table or view not found: orders",
+            "2024-01-01 10:02:00 ERROR java.lang.OutOfMemoryError: Java heap space"
+        ])
+    }
+
+    result = await log_analyzer.analyze_logs_iteratively(log_content)
+
+    severities = [e.severity for e in result['error_summary']]
+    assert severities[0] == 'critical'
+    assert 'high' in severities
+
+def test_iter_chunks_matches_split_and_join():
+    contents = ["", "\n", "one", "one\ntwo\n", "a\n\nb\nc\n\n", "x\ny\nz"]
+
+    for content in contents:
+        for lines_per_chunk in (1, 2, 3):
+            lines = content.split('\n')
+            expected = ['\n'.join(lines[i:i + lines_per_chunk])
+                        for i in range(0, len(lines), lines_per_chunk)]
+            assert list(_iter_chunks(content, lines_per_chunk)) == expected
+
+def test_score_chunk_matches_per_pattern_reference(log_analyzer):
+    # Overlapping patterns (e.g. two OutOfMemoryError variants) each count their matches
+    contents = [
+        "2024-01-01 10:01:00 ERROR java.lang.OutOfMemoryError: Java heap space",
+        "2024-01-01 10:02:00 WARN Task failed; ERROR executor lost\nCaused by: SparkException",
+        "2024-01-01 10:03:00 ERROR Connection REFUSED by Hōst, failed"
+    ]
+    weights = {'critical': 5.0, 'high': 3.0, 'medium': 2.0, 'low': 1.0}
+    keywords = [(r'\bfatal\b', 2.0), (r'\bcritical\b', 2.0), (r'\bsevere\b', 1.8),
+                (r'\berror\b', 1.5), (r'\bexception\b', 1.5), (r'\bfailed\b', 1.2),
+                (r'\bfailure\b', 1.2), (r'\bwarning\b', 0.8), (r'\bwarn\b', 0.8)]
+
+    for content in contents:
+        expected = 1.0  # stderr
+        for config in log_analyzer.error_patterns.values():
+            for pattern in config['patterns']:
+                matches = len(re.findall(pattern, content, re.IGNORECASE))
+                if matches > 0:
+                    expected += matches * weights[config['severity']] * (config['priority'] / 100.0)
+        for pattern, weight in keywords:
+            expected += len(re.findall(pattern, content, re.IGNORECASE)) * weight
+
+        score, _ = log_analyzer._score_chunk(content, 'stderr')
+        assert score == pytest.approx(expected)
+
+def test_finish_summary_truncates_at_line_boundary(log_analyzer):
+    log_analyzer.max_token_limit = 40
+    parts = [f"line {i} with a few words" for i in range(20)]
+
+    summary, token_estimate = log_analyzer._finish_summary(parts)
+
+    assert summary.startswith("line 0 with a few words\nline 1")
+    assert summary.endswith("(Content truncated to stay within 40 token limit)")
+    assert token_estimate == log_analyzer._estimate_tokens(summary)
+    assert token_estimate <= log_analyzer.max_token_limit
+
+    untouched, _ = log_analyzer._finish_summary(parts[:2])
+    assert untouched == '\n'.join(parts[:2])
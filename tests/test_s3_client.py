@@ -1,7 +1,10 @@
 import pytest
 import asyncio
+import gzip
+import io
+from datetime import datetime, timezone
 from unittest.mock import Mock, patch, AsyncMock
-from src.utils.s3_client import S3LogClient
+from src.utils.s3_client import LogFile, S3LogClient
 
 @pytest.fixture
 def s3_client():
@@ -63,21 +66,23 @@ async def test_list_cluster_logs_success(s3_client):
         result = await s3_client.list_cluster_logs(cluster_id)
 
         assert len(result) == 2
-        assert result[0]['file_name'] == 'stdout'  # Should be sorted by last_modified desc
-        assert result[0]['log_type'] == 'stdout'
-        assert result[1]['file_name'] == 'stderr'
-        assert result[1]['log_type'] == 'stderr'
+        assert result[0].file_name == 'stdout'  # Should be sorted by last_modified desc
+        assert result[0].log_type == 'stdout'
+        assert result[1].file_name == 'stderr'
+        assert result[1].log_type == 'stderr'
 
 @pytest.mark.asyncio
 async def test_search_error_patterns(s3_client):
     cluster_id = "cluster-123"
 
     mock_log_files = [
-        {
-            'key': 'databrickslogs/cluster-123/driver/stderr',
-            'file_name': 'stderr',
-            'log_type': 'stderr'
-        }
+        LogFile(
+            key='databrickslogs/cluster-123/driver/stderr',
+            file_name='stderr',
+            size=1024,
+            last_modified='2024-01-01T00:00:00+00:00',
+            log_type='stderr'
+        )
     ]
 
     mock_content = """
@@ -93,4 +98,224 @@ async def test_search_error_patterns(s3_client):
             assert 'memory_errors' in result
             assert 'job_failures' in result
             assert len(result['memory_errors']) > 0
-            assert len(result['job_failures']) > 0
\ No newline at end of file
+            assert len(result['job_failures']) > 0
+
+@pytest.mark.asyncio
+async def test_list_cluster_logs_reuses_recent_listing(s3_client):
+    mock_objects = [{'Key': 'databrickslogs/cluster-123/driver/stderr', 'Size': 1024,
+                     'LastModified': datetime(2024, 1, 1, tzinfo=timezone.utc)}]
+
+    with patch.object(s3_client.s3_client, 'get_paginator') as mock_paginator:
+        mock_paginator.return_value.paginate.return_value = [{'Contents': mock_objects}]
+
+        first = await s3_client.list_cluster_logs('cluster-123')
+        second = await s3_client.list_cluster_logs('cluster-123')
+        assert first == second
+        assert mock_paginator.call_count == 1
+
+        # Expired listings are fetched again
+        s3_client.LISTING_TTL_SECONDS = 0
+        await s3_client.list_cluster_logs('cluster-123')
+        assert mock_paginator.call_count == 2
+
+@pytest.mark.asyncio
+async def test_search_error_patterns_stops_when_categories_full(s3_client):
+    mock_log_files = [
+        LogFile(key=f'databrickslogs/cluster-123/driver/{name}', file_name=name,
+                size=1024, last_modified='2024-01-01T00:00:00+00:00', log_type=name)
+        for name in ('stderr', 'stdout')
+    ]
+    mock_content = "ERROR java.lang.OutOfMemoryError: Java heap space\n" * 3
+
+    with patch.object(s3_client, 'list_cluster_logs', return_value=mock_log_files):
+        with patch.object(s3_client, 'download_and_read_log', return_value=mock_content) as mock_download:
+            result = await s3_client.search_error_patterns(
+                'cluster-123',
+                custom_patterns={'memory_issues': [r'outofmemoryerror']},
+                max_errors_per_category=2
+            )
+
+    assert len(result['memory_issues']) == 2
+    assert mock_download.call_count == 1
+
+@pytest.mark.asyncio
+async def test_search_error_patterns_keeps_priority_order_with_read_ahead(s3_client):
+    names = ('stderr', 'log4j', 'driver', 'executor', 'stdout')
+    mock_log_files = [
+        LogFile(key=f'databrickslogs/cluster-123/driver/{name}', file_name=name,
+                size=1024, last_modified='2024-01-01T00:00:00+00:00', log_type=name)
+        for name in names
+    ]
+
+    async def slow_then_fast(key, **kwargs):
+        # Later files finish first, so results must not be merged in completion order
+        await asyncio.sleep(0.01 * (len(names) - names.index(key.rsplit('/', 1)[1])))
+        return "ERROR java.lang.OutOfMemoryError: Java heap space\n"
+
+    with patch.object(s3_client, 'list_cluster_logs', return_value=mock_log_files):
+        with patch.object(s3_client, 'download_and_read_log', side_effect=slow_then_fast):
+            result = await s3_client.search_error_patterns(
+                'cluster-123',
+                custom_patterns={'memory_issues': [r'outofmemoryerror']},
+                max_errors_per_category=10
+            )
+
+    assert [error['file'] for error in result['memory_issues']] == list(names)
+
+@pytest.mark.asyncio
+async def test_search_error_patterns_read_ahead_respects_byte_budget(s3_client):
+    mock_log_files = [
+        LogFile(key=f'databrickslogs/cluster-123/executor/stderr.{i}', file_name=f'stderr.{i}',
+                size=1024, last_modified='2024-01-01T00:00:00+00:00', log_type='stderr')
+        for i in range(8)
+    ]
+    s3_client.READ_AHEAD_BYTES = 2048
+    in_flight, peak = 0, 0
+
+    async def download(key, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return "ERROR java.lang.OutOfMemoryError: Java heap space\n"
+
+    with patch.object(s3_client, 'list_cluster_logs', return_value=mock_log_files):
+        with patch.object(s3_client, 'download_and_read_log', side_effect=download):
+            result = await s3_client.search_error_patterns(
+                'cluster-123',
+                custom_patterns={'memory_issues': [r'outofmemoryerror']},
+                max_errors_per_category=50
+            )
+
+    assert len(result['memory_issues']) == 8
+    assert peak == 2
+
+@pytest.mark.asyncio
+async def test_search_error_patterns_read_ahead_charges_gz_decompressed_size(s3_client):
+    mock_log_files = [
+        LogFile(key=f'databrickslogs/cluster-123/executor/stderr.{i}.gz', file_name=f'stderr.{i}.gz',
+                size=1024, last_modified='2024-01-01T00:00:00+00:00', log_type='stderr')
+        for i in range(8)
+    ]
+    s3_client.READ_AHEAD_BYTES = 2 * 1024 * s3_client.MAX_DECOMPRESSED_RATIO
+    in_flight, peak = 0, 0
+
+    async def download(key, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return "ERROR java.lang.OutOfMemoryError: Java heap space\n"
+
+    with patch.object(s3_client, 'list_cluster_logs', return_value=mock_log_files):
+        with patch.object(s3_client, 'download_and_read_log', side_effect=download):
+            result = await s3_client.search_error_patterns(
+                'cluster-123',
+                custom_patterns={'memory_issues': [r'outofmemoryerror']},
+                max_errors_per_category=50
+            )
+
+    assert len(result['memory_issues']) == 8
+    assert peak == 2
+
+@pytest.mark.asyncio
+async def test_iter_error_matches_streams_search_results(s3_client):
+    mock_log_files = [
+        LogFile(key=f'databrickslogs/cluster-123/driver/{name}', file_name=name,
+                size=1024, last_modified='2024-01-01T00:00:00+00:00', log_type=name)
+        for name in ('stderr', 'stdout')
+    ]
+    mock_content = "ERROR java.lang.OutOfMemoryError: Java heap space\nINFO ok\nFATAL ERROR: crash\n"
+    patterns = {'memory_issues': [r'outofmemoryerror'], 'critical_errors': [r'fatal\s+error']}
+
+    with patch.object(s3_client, 'list_cluster_logs', return_value=mock_log_files):
+        with patch.object(s3_client, 'download_and_read_log', return_value=mock_content):
+            streamed = [item async for item in s3_client.iter_error_matches('cluster-123', patterns, 3)]
+            result = await s3_client.search_error_patterns('cluster-123', patterns, 3)
+
+            matches = s3_client.iter_error_matches('cluster-123', patterns, 3)
+            first = await matches.__anext__()
+            await matches.aclose()
+
+    assert [(category, error['file']) for category, error in streamed] == [
+        ('memory_issues', 'stderr'), ('critical_errors', 'stderr'),
+        ('memory_issues', 'stdout'), ('critical_errors', 'stdout')
+    ]
+    assert {category: [e for c, e in streamed if c == category] for category in patterns} == result
+    assert first == streamed[0]
+
+@pytest.mark.asyncio
+async def test_get_log_snippet_prefilter_matches_regex(s3_client):
+    mock_content = "\n".join([
+        "2024-01-01 10:00:00 INFO Starting job",
+        "2024-01-01 10:01:00 ERROR java.lang.OutOfMemoryError: Java heap space",
+        "2024-01-01 10:02:00 INFO outofmemoryerror handler registered"
+    ])
+
+    with patch.object(s3_client, 'download_and_read_log', return_value=mock_content):
+        literal = await s3_client.get_log_snippet('key', 'OutOfMemoryError', around_lines=0)
+        regex = await s3_client.get_log_snippet('key', r'OutOfMemoryError.*heap', around_lines=0)
+        missing = await s3_client.get_log_snippet('key', 'StackOverflowError', around_lines=0)
+
+    assert literal.count('>>>') == 2
+    assert regex.count('>>>') == 1
+    assert 'Java heap space' in regex
+    assert missing == ''
+
+@pytest.mark.asyncio
+async def test_search_patterns_in_content_literal_prefilter(s3_client):
+    log_file = LogFile(key='databrickslogs/cluster-123/driver/stderr', file_name='stderr',
+                       size=1024, last_modified='2024-01-01T00:00:00+00:00', log_type='stderr')
+    content = "INFO starting\nFATAL   Error in executor\nINFO done"
+
+    result = await s3_client._search_patterns_in_content(
+        content,
+        {'critical_errors': [r'(?i)\bfatal\s+error\b'], 'io_errors': [r'(?i)\bbroken\s+pipe\b']},
+        log_file,
+        10
+    )
+
+    assert [e['line'] for e in result['critical_errors']] == ['FATAL   Error in executor']
+    assert result['io_errors'] == []
+
+@pytest.mark.asyncio
+async def test_download_and_read_log_streams_body(s3_client):
+    data = b"line1\r\nline2\nline3\n"
+
+    def _get_object(Bucket, Key):
+        body = gzip.compress(data) if Key.endswith('.gz') else data
+        return {'ContentLength': len(body), 'Body': io.BytesIO(body)}
+
+    with patch.object(s3_client.s3_client, 'head_object') as mock_head:
+        with patch.object(s3_client.s3_client, 'get_object', side_effect=_get_object):
+            plain = await s3_client.download_and_read_log('databrickslogs/cluster-123/driver/stderr')
+            compressed = await s3_client.download_and_read_log('databrickslogs/cluster-123/driver/stderr.gz')
+            raw = await s3_client.download_and_read_log('databrickslogs/cluster-123/driver/stderr.gz',
+                                                        ascii_bytes=True)
+
+    mock_head.assert_not_called()
+
+    assert plain == compressed == "line1\nline2\nline3\n"
+    assert raw == b"line1\nline2\nline3\n"
+
+@pytest.mark.asyncio
+async def test_download_and_read_log_caps_decompressed_size(s3_client):
+    # Highly compressible, so the object itself is well under the limit
+    data = gzip.compress(b"\n" * (3 * 1024 * 1024))
+    s3_client.MAX_DECOMPRESSED_RATIO = 2
+
+    response = {'ContentLength': len(data), 'Body': io.BytesIO(data)}
+    with patch.object(s3_client.s3_client, 'get_object', return_value=response):
+        with pytest.raises(Exception, match="too large once decompressed"):
+            await s3_client.download_and_read_log('databrickslogs/cluster-123/driver/stderr.gz',
+                                                  max_size_mb=1)
+
+    # Objects over the limit are rejected from the response headers, unread
+    response = {'ContentLength': 2 * 1024 * 1024, 'Body': io.BytesIO(b"x")}
+    with patch.object(s3_client.s3_client, 'get_object', return_value=response):
+        with pytest.raises(Exception, match="is too large"):
+            await s3_client.download_and_read_log('databrickslogs/cluster-123/driver/stderr',
+                                                  max_size_mb=1)
+    assert response['Body'].closed